@@ -0,0 +1,278 @@
+'''Performance benchmarks of the evolution components (grammar, operators,
+archive of unique solutions and checkpoints).
+
+Usage (from the project folder):
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.25
+
+Each benchmark runs with pinned seeds. The median time per call is
+stored in the output file; with a baseline, benchmarks slower than
+baseline * (1 + tolerance) are reported as regressions (exit code 1).'''
+import os
+import sys
+import json
+import random
+import timeit
+import platform
+import argparse
+import tempfile
+import datetime as dt
+from typing import Callable, List
+
+import numpy as np
+
+from cbioge.algorithms import (
+    Solution,
+    GrammaticalEvolution,
+    TournamentSelection,
+    OnePointCrossover,
+    GeneCrossover,
+    PointMutation,
+    ReplaceWorst,
+    ElitistReplacement,
+)
+from cbioge.grammars import Grammar
+from cbioge.utils import checkpoint as ckpt
+
+
+SEED = 42
+
+GRAMMARS = ['cnn', 'unet']
+POP_SIZES = [10, 100, 1000]
+ARCHIVE_SIZES = [100, 1000, 10000]
+RUN_LENGTHS = [100, 1000]
+
+GRAMMAR_FOLDER = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'assets', 'grammars')
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, params: list=None):
+    '''Registers a benchmark. The function receives a parameter (one run
+    per parameter), prepares the data and returns the callable timed.'''
+
+    def decorator(function):
+        for param in params or [None]:
+            full_name = name if param is None else f'{name}[{param}]'
+            BENCHMARKS.append((full_name, function, param))
+        return function
+    return decorator
+
+
+def set_seed():
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+
+def get_parser(name: str) -> Grammar:
+    return Grammar(os.path.join(GRAMMAR_FOLDER, f'{name}_example.json'))
+
+
+def get_population(parser: Grammar, size: int) -> List[Solution]:
+    population = []
+    for index in range(size):
+        solution = Solution(parser.create_solution(), data={}, id=index)
+        solution.fitness = np.random.rand()
+        population.append(solution)
+    return population
+
+
+@benchmark('grammar.create_solution', GRAMMARS)
+def bench_create_solution(name: str) -> Callable:
+    return get_parser(name).create_solution
+
+
+@benchmark('grammar.recursive_parse', GRAMMARS)
+def bench_recursive_parse(name: str) -> Callable:
+    parser = get_parser(name)
+    genotypes = [parser.create_solution() for _ in range(20)]
+    def run():
+        for genotype in genotypes:
+            parser.recursive_parse(genotype)
+    return run
+
+
+@benchmark('operators.selection', POP_SIZES)
+def bench_selection(size: int) -> Callable:
+    population = get_population(get_parser('cnn'), size)
+    selection = TournamentSelection(2, 2, maximize=True)
+    # one generation: a pair of parents per offspring
+    def run():
+        for _ in range(size):
+            selection.execute(population)
+    return run
+
+
+def _crossover(operator) -> Callable:
+    def bench(size: int) -> Callable:
+        population = get_population(get_parser('cnn'), size)
+        pairs = [(population[i], population[-i-1]) for i in range(size)]
+        def run():
+            for parents in pairs:
+                operator.execute(list(parents))
+        return run
+    return bench
+
+benchmark('operators.one_point_crossover', POP_SIZES)(_crossover(OnePointCrossover(1.0)))
+benchmark('operators.gene_crossover', POP_SIZES)(_crossover(GeneCrossover(1.0)))
+
+
+@benchmark('operators.mutation', POP_SIZES)
+def bench_mutation(size: int) -> Callable:
+    parser = get_parser('cnn')
+    population = get_population(parser, size)
+    mutation = PointMutation(parser, 1.0)
+    def run():
+        for solution in population:
+            mutation.execute(solution)
+    return run
+
+
+def _replacement(operator) -> Callable:
+    def bench(size: int) -> Callable:
+        parser = get_parser('cnn')
+        population = get_population(parser, size)
+        offspring = get_population(parser, size)
+        def run():
+            operator.execute(population[:], offspring[:])
+        return run
+    return bench
+
+benchmark('operators.replace_worst', POP_SIZES)(_replacement(ReplaceWorst(maximize=True)))
+benchmark('operators.elitist_replacement', POP_SIZES)(
+    _replacement(ElitistReplacement(0.1, maximize=True)))
+
+
+@benchmark('dsge.accept_solution', ARCHIVE_SIZES)
+def bench_accept_solution(size: int) -> Callable:
+    parser = get_parser('cnn')
+    algorithm = GrammaticalEvolution(None, seed=SEED)
+    algorithm.unique_solutions = [parser.create_solution() for _ in range(size)]
+    candidates = [Solution(parser.create_solution()) for _ in range(10)]
+    def run():
+        for candidate in candidates:
+            algorithm.accept_solution(candidate)
+        # the archive keeps its size
+        del algorithm.unique_solutions[size:]
+    return run
+
+
+def _get_run(length: int) -> GrammaticalEvolution:
+    # state of an evolution after length evaluations
+    parser = get_parser('cnn')
+    algorithm = GrammaticalEvolution(None, pop_size=20, seed=SEED)
+    algorithm.population = get_population(parser, 20)
+    algorithm.unique_solutions = [parser.create_solution() for _ in range(length)]
+    algorithm.evals = length
+    return algorithm
+
+
+@benchmark('dsge.save_state', RUN_LENGTHS)
+def bench_save_state(length: int) -> Callable:
+    return _get_run(length).save_state
+
+
+@benchmark('dsge.load_state', RUN_LENGTHS)
+def bench_load_state(length: int) -> Callable:
+    algorithm = _get_run(length)
+    algorithm.save_state()
+    return algorithm.load_state
+
+
+def measure(function: Callable, param, repeat: int) -> dict:
+    set_seed()
+    run = function(param)
+
+    # number of calls per repetition (at least 0.2s)
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+
+    times = []
+    for _ in range(repeat):
+        set_seed()
+        times.append(timer.timeit(number) / number)
+
+    return {
+        'median': float(np.median(times)),
+        'min': float(np.min(times)),
+        'number': number,
+        'repeat': repeat}
+
+
+def run_benchmarks(pattern: str=None, repeat: int=5) -> dict:
+    results = {}
+    ckpt_folder = ckpt.CKPT_FOLDER
+    try:
+        for name, function, param in BENCHMARKS:
+            if pattern is not None and pattern not in name:
+                continue
+            # checkpoints are written to a temporary folder per benchmark,
+            # since load_state reads the latest checkpoint in the folder
+            with tempfile.TemporaryDirectory() as folder:
+                ckpt.CKPT_FOLDER = folder
+                results[name] = measure(function, param, repeat)
+            print(f'{name:45} {results[name]["median"] * 1e3:12.4f} ms')
+    finally:
+        ckpt.CKPT_FOLDER = ckpt_folder
+
+    return {
+        'meta': {
+            'date': dt.datetime.today().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': SEED},
+        'results': results}
+
+
+def compare(results: dict, baseline: dict, tolerance: float=0.25) -> List[str]:
+    '''Prints the ratio (current / baseline) of the median times of the
+    benchmarks in both files and returns the names of the regressions.'''
+
+    regressions = []
+    for name, current in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = current['median'] / baseline['results'][name]['median']
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = 'REGRESSION'
+        print(f'{name:45} {ratio:8.2f}x {flag}')
+    return regressions
+
+
+def main(argv: List[str]=None) -> int:
+    args = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    args.add_argument('--output', default='benchmark_results.json',
+        help='file where the results are written')
+    args.add_argument('--baseline', default=None,
+        help='results of a previous run to compare with')
+    args.add_argument('--tolerance', type=float, default=0.25,
+        help='slowdown accepted before flagging a regression (0.25 = 25%%)')
+    args.add_argument('--filter', default=None,
+        help='runs only benchmarks whose name contains this text')
+    args.add_argument('--repeat', type=int, default=5)
+    args = args.parse_args(argv)
+
+    results = run_benchmarks(args.filter, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
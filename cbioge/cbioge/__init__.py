@@ -1,6 +1,13 @@
 from . import algorithms
-from . import datasets
 from . import experiments
 from . import grammars
 from . import problems
 from . import utils
+
+
+def __getattr__(name):
+    # datasets import keras, they are only loaded when used
+    if name == 'datasets':
+        import importlib # pylint: disable=import-outside-toplevel
+        return importlib.import_module('.datasets', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,7 +1,10 @@
 from __future__ import annotations
+import os
 from typing import List, TYPE_CHECKING
 
 from ..algorithms import BaseEvolutionaryAlgorithm
+from ..utils import checkpoint as ckpt
+from ..utils import timing, tracing
 
 # TODO study better way to handle this
 # avoids import cycles while using typing
@@ -14,13 +17,17 @@ if TYPE_CHECKING:
     )
     from ..algorithms import Solution
     from ..problems import BaseProblem
+    from ..problems.workers import WorkerPool
 
 
 class GrammaticalEvolution(BaseEvolutionaryAlgorithm):
     '''Genetic Algorithm modified to work with the DSGE encoding.
 
     This modified version mainstains a list of unique solutions stored, which
-    helps increasing the diversity.'''
+    helps increasing the diversity.
+
+    If a pool of workers is given, solutions are evaluated by the workers
+    (see problems.workers) instead of the current process.'''
 
     def __init__(self, problem: BaseProblem,
         pop_size: int=10,
@@ -30,13 +37,22 @@ class GrammaticalEvolution(BaseEvolutionaryAlgorithm):
         replacement: ReplacementOperator=None,
         crossover: CrossoverOperator=None,
         mutation: MutationOperator=None,
-        seed: int=None
+        seed: int=None,
+        workers: WorkerPool=None
     ):
 
         super().__init__(problem, pop_size, max_evals, verbose, selection,
             replacement, crossover, mutation, seed)
 
         self.unique_solutions = []
+        self.workers = workers
+
+        # number of solutions rejected by each constraint of the problem
+        # (see DNNProblem max_params), one entry per generation
+        self.rejections = []
+
+        # time spent in each phase per generation (if timing is enabled)
+        self.timings = []
 
     def create_population(self, size: int) -> List[Solution]:
         population = []
@@ -65,9 +81,14 @@ class GrammaticalEvolution(BaseEvolutionaryAlgorithm):
             return
 
         # performs mapping and evaluates taking the time spent
-        self.problem.map_genotype_to_phenotype(solution)
-        self.problem.evaluate(solution)
+        with timing.phase('mapping'):
+            self.problem.map_genotype_to_phenotype(solution)
+        with timing.phase('evaluate', solution=solution.id):
+            self.problem.evaluate(solution)
 
+        self._solution_evaluated(solution)
+
+    def _solution_evaluated(self, solution: Solution) -> None:
         solution.evaluated = True
 
         # updates the solution file
@@ -79,8 +100,50 @@ class GrammaticalEvolution(BaseEvolutionaryAlgorithm):
             self.logger.debug(log_text)
 
     def evaluate_population(self, population: List[Solution]) -> None:
+        with timing.phase('evaluation'):
+            if self.workers is None:
+                for solution in population:
+                    self.evaluate_solution(solution)
+            else:
+                # mapping and evaluation are done by the workers
+                pending = [solution for solution in population if not solution.evaluated]
+                self.workers.evaluate(pending)
+                for solution in pending:
+                    self._solution_evaluated(solution)
+
+        self.count_rejections(population)
+
+    def count_rejections(self, population: List[Solution]) -> None:
+        counts = {}
         for solution in population:
-            self.evaluate_solution(solution)
+            for name in solution.data.get('violations', []):
+                counts[name] = counts.get(name, 0) + 1
+        self.rejections.append(counts)
+
+        if counts:
+            log_text = (f'Rejected {sum(counts.values())}/{len(population)} '
+                + f'solutions by constraint: {counts}')
+            self.logger.info(log_text)
+
+    def collect_timing(self) -> None:
+        # times of the generation, the checkpoint of a generation is
+        # counted in the next one
+        self.save_trace()
+
+        summary = timing.collect()
+        if not summary:
+            return
+        self.timings.append(summary)
+        self.logger.info(f'Timing (evals {self.evals}): {timing.format_summary(summary)}')
+
+    def save_trace(self) -> None:
+        # the new events of the timeline are added to the checkpoint folder
+        if not tracing.ENABLED:
+            return
+        try:
+            tracing.save(os.path.join(ckpt.CKPT_FOLDER, ckpt.TRACE_NAME))
+        except OSError:
+            self.logger.warning(f'Fail to save {ckpt.TRACE_NAME}')
 
     def accept_solution(self, solution: Solution) -> bool:
         # maintain only unique solutions
@@ -98,58 +161,79 @@ class GrammaticalEvolution(BaseEvolutionaryAlgorithm):
         if checkpoint:
             self.load_state()
 
+        if tracing.ENABLED:
+            tracing.set_process_name('evolution')
+
         if len(self.population) == 0:
-            self.population = self.create_population(self.pop_size)
+            with timing.phase('initialization'):
+                self.population = self.create_population(self.pop_size)
             self.evaluate_population(self.population)
             self.evals = len(self.population)
+            self.collect_timing()
             self.save_state()
 
         self.print_progress()
 
         offspring_pop = []
         while self.evals < self.max_evals:
-
-            # creates a new population from recombining the current one
-            index = 0
-            while len(offspring_pop) < self.pop_size:
-
-                # tries to load solution if starting from checkpoint
-                offspring = self.load_solution(self.evals + index)
-
-                # creates new solution if load fails
-                # TODO temp fix for possible infinite loop when loading 
-                # solution that already exists
-                # rework the load solution strategy
-                if offspring is None or not self.accept_solution(offspring):
-                    # apply selection and recombination operators
-                    parents = self.apply_selection()
-                    offspring = self.apply_crossover(parents)
-                    offspring = self.apply_mutation(offspring)
-                    offspring.id = self.evals + index # check
-
-                if self.accept_solution(offspring):
-                    self.save_solution(offspring)
-                    offspring_pop.append(offspring)
-                    index += 1
-
-            self.evaluate_population(offspring_pop)
-
-            self.population = self.apply_replacement(offspring_pop)
-
-            self.evals += self.pop_size
-            offspring_pop.clear()
-
+            with timing.phase('generation', evals=self.evals):
+                # creates a new population from recombining the current one
+                index = 0
+                while len(offspring_pop) < self.pop_size:
+
+                    # tries to load solution if starting from checkpoint
+                    offspring = self.load_solution(self.evals + index)
+
+                    # creates new solution if load fails
+                    # TODO temp fix for possible infinite loop when loading 
+                    # solution that already exists
+                    # rework the load solution strategy
+                    if offspring is None or not self.accept_solution(offspring):
+                        # apply selection and recombination operators
+                        with timing.phase('selection'):
+                            parents = self.apply_selection()
+                        with timing.phase('crossover'):
+                            offspring = self.apply_crossover(parents)
+                        with timing.phase('mutation'):
+                            offspring = self.apply_mutation(offspring)
+                        offspring.id = self.evals + index # check
+
+                    if self.accept_solution(offspring):
+                        self.save_solution(offspring)
+                        offspring_pop.append(offspring)
+                        index += 1
+
+                # offspring that cannot enter the population may be stopped
+                # during training (see DNNProblem curve_stopping)
+                if self.replacement is not None:
+                    self.problem.fitness_threshold = \
+                        self.replacement.entry_threshold(self.population)
+
+                self.evaluate_population(offspring_pop)
+
+                with timing.phase('replacement'):
+                    self.population = self.apply_replacement(offspring_pop)
+
+                self.evals += self.pop_size
+                offspring_pop.clear()
+
+            self.collect_timing()
             self.save_state()
             self.print_progress()
 
+        self.save_trace()
+
         return max(self.population, key=lambda x: x.fitness)
 
     def save_state(self, data: dict=None) -> None:
         '''Saves the current population and evaluations by default.
-        Additionally saves the list of unique solutions'''
+        Additionally saves the list of unique solutions, the number of
+        rejected solutions and the timing of each generation'''
 
         data = {
             'unique': self.unique_solutions,
+            'rejections': self.rejections,
+            'timings': self.timings,
         }
 
         # super method will add population and evals
@@ -165,6 +249,10 @@ class GrammaticalEvolution(BaseEvolutionaryAlgorithm):
         # super method already loads population and evals
         if 'unique' in data:
             self.unique_solutions = data['unique']
+        if 'rejections' in data:
+            self.rejections = data['rejections']
+        if 'timings' in data:
+            self.timings = data['timings']
 
         if self.verbose:
             debug_text = f'Unique solutions: {len(self.unique_solutions)}'
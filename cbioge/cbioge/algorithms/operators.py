@@ -52,6 +52,11 @@ class ReplacementOperator(GeneticOperator):
     ) -> List[Solution]:
         raise NotImplementedError('Not implemented yet.')
 
+    def entry_threshold(self, population: List[Solution]) -> float: # pylint: disable=unused-argument
+        '''Fitness an offspring must surpass to possibly enter the population,
+        None if any offspring may enter.'''
+        return None
+
 
 class SelectionOperator(GeneticOperator):
 
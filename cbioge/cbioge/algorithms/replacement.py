@@ -23,6 +23,14 @@ class ReplaceWorst(ReplacementOperator):
         population.sort(key=lambda x: x.fitness, reverse=self.maximize)
         return population[:len(offspring)]
 
+    def entry_threshold(self, population: List[Solution]) -> float:
+        # an offspring must be better than the worst current solution, only
+        # thresholds of maximized fitness are given (learning curves predict
+        # higher is better values, see LearningCurveStopping)
+        if not population or not self.maximize:
+            return None
+        return min(s.fitness for s in population)
+
 
 class ElitistReplacement(ReplacementOperator):
     '''Replace the parent population by the offspring, maintaining a # of elites.
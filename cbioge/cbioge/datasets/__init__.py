@@ -1 +1,14 @@
 from .dataset import Dataset
+from .dataset import pickle_to_npy
+from .dataset import downsample
+
+from .folder import ImageFolder
+from .sequence import BatchSequence
+from .views import IndexedView
+from .patches import PatchSequence
+
+from .shared import SharedArrays
+from .shared import attach_arrays
+from .shared import detach_arrays
+
+from .preprocessing import preprocess
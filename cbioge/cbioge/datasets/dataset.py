@@ -1,9 +1,25 @@
+import os
+import json
 import pickle
+from typing import TYPE_CHECKING
 
 import numpy as np
 
 from keras.utils import np_utils
 
+from .folder import ImageFolder
+from .patches import PatchSequence
+from .sequence import BatchSequence
+from .views import IndexedView
+
+# shared memory needs python 3.8, it is imported by share and from_shared
+if TYPE_CHECKING:
+    from .shared import SharedArrays
+
+
+DATA_KEYS = ['x_train', 'y_train', 'x_test', 'y_test', 'x_valid', 'y_valid']
+INFO_NAME = 'info.json'
+
 
 class Dataset:
     '''Dataset class that holds the most common data structures used in
@@ -21,7 +37,8 @@ class Dataset:
         train_size: int=None,
         test_size: int=None,
         valid_size: int=None,
-        valid_split: float=None
+        valid_split: float=None,
+        sparse_labels: bool=False
     ):
         '''# Parameters
         - x_train: train data
@@ -39,7 +56,9 @@ class Dataset:
         - valid_size: defines the number of validation instances
         (default len(x_valid) if exists). It has priotity over split_size
         - valid_split: float between [0, 1] that expresses the % of the training
-        data that will be used as validation'''
+        data that will be used as validation
+        - sparse_labels: keeps the labels as integers instead of converting
+        them to categorical (one-hot) when num_classes is defined'''
 
         self.x_train = x_train
         self.y_train = y_train
@@ -67,13 +86,16 @@ class Dataset:
             self.x_valid, self.y_valid, self.x_train, self.y_train = self.split(
                 self.x_train, self.y_train, self.valid_size)
 
+        self.sparse_labels = sparse_labels
+
         # adds the number of classes if needed reshapes labels to be categorical
         if num_classes:
             self.num_classes = num_classes
-            self.y_train = np_utils.to_categorical(self.y_train, self.num_classes)
-            self.y_test = np_utils.to_categorical(self.y_test, self.num_classes)
+        if num_classes and not sparse_labels:
+            self.y_train = self._to_categorical(self.y_train)
+            self.y_test = self._to_categorical(self.y_test)
             if self.y_valid is not None:
-                self.y_valid = np_utils.to_categorical(self.y_valid, self.num_classes)
+                self.y_valid = self._to_categorical(self.y_valid)
 
     @classmethod
     def from_pickle(cls, pickle_file: str, **kwargs) -> 'Dataset':
@@ -82,21 +104,124 @@ class Dataset:
         return cls(**data_dict, **kwargs)
 
     @classmethod
-    def from_npy(cls):
-        pass
+    def from_npy(cls, npy_path: str, mmap_mode: str='r', **kwargs) -> 'Dataset':
+        '''Loads a dataset stored as numpy arrays.
+
+        The path can be a folder containing one .npy file per array, or a
+        single .npz file with the same keys:
+
+        dataset/
+        --x_train.npy
+        --y_train.npy
+        --x_test.npy
+        --y_test.npy
+        --x_valid.npy (optional)
+        --y_valid.npy (optional)
+        --info.json (optional, other arguments such as input_shape)
+
+        The .npy files are opened with np.load(mmap_mode), so the data is
+        read on demand and processes that load the same files share the
+        page-cached copy. Members of a .npz file cannot be memory-mapped
+        and are loaded when accessed.'''
+
+        if os.path.isdir(npy_path):
+            data_dict = _read_info(npy_path)
+            for key in DATA_KEYS:
+                file_name = os.path.join(npy_path, f'{key}.npy')
+                if os.path.exists(file_name):
+                    data_dict[key] = np.load(file_name, mmap_mode=mmap_mode)
+        else:
+            with np.load(npy_path) as npz_file:
+                data_dict = {k: npz_file[k] for k in npz_file.files if k in DATA_KEYS}
+
+        data_dict.update(kwargs)
+        return cls(**data_dict)
 
     @classmethod
-    def from_folder(cls):
-        '''
+    def from_folder(cls, folder: str,
+        dtype: str='float32',
+        scale: float=None,
+        cache: bool=False,
+        **kwargs
+    ) -> 'Dataset':
+        '''Loads a dataset stored as image files. Each set (train, test and
+        the optional valid) is a sub-folder with the images and labels:
+
         dataset/
-        --image/
-        ----image1
-        ----image2
-        --label/
-        ----label1
-        ----label2
-        '''
-        # TODO missing implementation
+        --train/
+        ----image/
+        ------image1
+        ------image2
+        ----label/
+        ------label1
+        ------label2
+        --test/
+        ----image/
+        ----label/
+        --valid/ (optional)
+
+        Images and labels are matched by their sorted file names. Nothing is
+        decoded at this point, the data is held as ImageFolders and read
+        in batches (see get_sequence).
+
+        # Parameters
+        - folder: root folder of the dataset
+        - dtype: type of the decoded arrays
+        - scale: if defined, decoded values are divided by it (ex: 255)
+        - cache: keeps decoded images in memory after the first read'''
+
+        data_dict = {}
+        for attr_name in ['train', 'test', 'valid']:
+            attr_folder = os.path.join(folder, attr_name)
+            if not os.path.exists(attr_folder):
+                continue
+            for prefix, sub_folder in [('x', 'image'), ('y', 'label')]:
+                data_dict[f'{prefix}_{attr_name}'] = ImageFolder(
+                    os.path.join(attr_folder, sub_folder), dtype=dtype,
+                    scale=scale, cache=cache)
+
+        data_dict.update(kwargs)
+        return cls(**data_dict)
+
+    @classmethod
+    def from_shared(cls, spec: dict) -> 'Dataset':
+        '''Creates a dataset attached to the arrays published by Dataset.share
+        (usually in another process). The arrays are read-only views of the
+        shared memory, nothing is copied or processed again.'''
+
+        from .shared import attach_arrays # pylint: disable=import-outside-toplevel
+
+        dataset = cls.__new__(cls)
+        dataset.__dict__.update(spec['info'])
+        dataset.__dict__.update(attach_arrays(spec))
+        return dataset
+
+    def share(self) -> 'SharedArrays':
+        '''Publishes the arrays of the dataset in shared memory.
+
+        The returned object owns the memory and must be kept alive while
+        workers use it (close it, or use it as a context manager, in the end).
+        Its spec is passed to the workers, that call Dataset.from_shared.
+        Requires python 3.8 or newer.'''
+
+        from .shared import SharedArrays # pylint: disable=import-outside-toplevel
+
+        arrays = {}
+        info = {}
+        for key, value in self.__dict__.items():
+            if key in DATA_KEYS and value is not None:
+                arrays[key] = value
+            else:
+                info[key] = value
+
+        return SharedArrays(arrays, info)
+
+    def _to_categorical(self, labels):
+        # labels already categorical (ex: saved by to_npy) are kept
+        shape = getattr(labels, 'shape', ())
+        if len(shape) > 1 and shape[-1] == self.num_classes > 1:
+            return labels
+        return np_utils.to_categorical(labels, self.num_classes)
 
     def _parse_attr_size(self, value, attr_data):
 
@@ -122,24 +247,295 @@ class Dataset:
         return data_a, label_a, data_b, label_b
 
     def shuffle(self, data, labels):
-        '''Shuffles a pair of data and labels'''
+        '''Shuffles a pair of data and labels.
+
+        This copies the data, use get_indexes or get_sequence to work with
+        shuffled indexes instead.'''
 
         indexes = np.random.permutation(np.arange(len(data)))
         return data[indexes], labels[indexes]
 
-    def get_data(self, attr_name: str, sample_size: int=None, shuffle: bool=False):
+    def to_npy(self, npy_folder: str) -> str:
+        '''Saves the dataset in the folder layout read by Dataset.from_npy.
+
+        Only the instances in use (train_size, test_size, valid_size) are
+        saved, after the split and label conversion, so the saved dataset
+        can be loaded without any processing.'''
+
+        if not os.path.exists(npy_folder):
+            os.makedirs(npy_folder)
+
+        for attr_name in ['train', 'test', 'valid']:
+            if getattr(self, f'x_{attr_name}') is None:
+                continue
+            x_data, y_data = self.get_data(attr_name)
+            np.save(os.path.join(npy_folder, f'x_{attr_name}.npy'), np.asarray(x_data))
+            np.save(os.path.join(npy_folder, f'y_{attr_name}.npy'), np.asarray(y_data))
+
+        info = {
+            'input_shape': self.input_shape,
+            'num_classes': getattr(self, 'num_classes', None),
+            'sparse_labels': self.sparse_labels,
+        }
+        _write_info(npy_folder, info)
+
+        return npy_folder
+
+    def proxy(self, factor: int=2, sample_size: int=None) -> 'Dataset':
+        '''Returns a reduced version of the dataset, used for cheaper
+        (low fidelity) evaluations.
+
+        # Parameters
+        - factor: images are downsampled by this factor (ex: 2 for 1/2 of
+        the resolution), segmentation masks are downsampled as well
+        - sample_size: number of training instances kept, sampled keeping the
+        class proportions when the labels are classes (default train_size)'''
+
+        dataset = Dataset.__new__(Dataset)
+        dataset.__dict__.update(self.__dict__)
+
+        for attr_name in ['train', 'test', 'valid']:
+            if getattr(self, f'x_{attr_name}') is None:
+                continue
+
+            if attr_name == 'train' and sample_size is not None:
+                is_class = np.ndim(self.y_train[0]) <= 1
+                indexes = np.sort(self.get_indexes('train', sample_size,
+                    shuffle=True, stratify=is_class))
+                x_data, y_data = self.x_train[indexes], self.y_train[indexes]
+            elif factor == 1:
+                # nothing to reduce, the original (ex: memory-mapped) data is kept
+                continue
+            else:
+                x_data, y_data = self.get_data(attr_name)
+
+            if factor > 1:
+                is_mask = np.ndim(y_data[0]) > 1 \
+                    and np.shape(y_data[0])[:2] == np.shape(x_data[0])[:2]
+                x_data = downsample(x_data, factor)
+                y_data = downsample(y_data, factor, True) if is_mask else np.asarray(y_data)
+
+            setattr(dataset, f'x_{attr_name}', x_data)
+            setattr(dataset, f'y_{attr_name}', y_data)
+            setattr(dataset, f'{attr_name}_size', len(x_data))
+
+        dataset.input_shape = dataset.x_train[0].shape
+
+        return dataset
+
+    def stratify(self, labels, sample_size: int) -> np.ndarray:
+        '''Returns sample_size random indexes of the labels, keeping the
+        proportion of each class. Labels can be integers or categorical.'''
+
+        labels = np.asarray(labels)
+        if labels.ndim > 1 and labels.shape[-1] > 1:
+            labels = labels.argmax(axis=-1)
+        labels = labels.reshape(len(labels))
+
+        classes, counts = np.unique(labels, return_counts=True)
+
+        # number of instances per class (largest remainder)
+        quotas = counts * sample_size / len(labels)
+        sizes = np.floor(quotas).astype(int)
+        remainder = sample_size - sizes.sum()
+        sizes[np.argsort(sizes - quotas)[:remainder]] += 1
+
+        indexes = [np.random.choice(np.flatnonzero(labels == c), size, replace=False)
+            for c, size in zip(classes, sizes)]
+
+        return np.random.permutation(np.concatenate(indexes))
+
+    def get_indexes(self, attr_name: str,
+        sample_size: int=None,
+        shuffle: bool=False,
+        stratify: bool=False
+    ) -> np.ndarray:
+        '''Returns the indexes of the instances used by get_data.
+
+        # Parameters
+        - attr_name: train, test or valid
+        - sample_size: number of indexes (default the size of the set)
+        - shuffle: indexes are sampled from a random permutation of the set
+        - stratify: indexes are sampled keeping the class proportions'''
 
         if attr_name not in ['train', 'test', 'valid']:
             raise ValueError(f'Unknown set name: {attr_name}')
 
-        x_data = getattr(self, f'x_{attr_name}')
-        y_data = getattr(self, f'y_{attr_name}')
+        data_len = len(getattr(self, f'x_{attr_name}'))
         data_size = getattr(self, f'{attr_name}_size')
 
         if sample_size is not None:
             data_size = sample_size
+        data_size = min(data_size, data_len)
+
+        if stratify:
+            labels = getattr(self, f'y_{attr_name}')
+            return self.stratify(labels, data_size)
 
         if shuffle:
-            x_data, y_data = self.shuffle(x_data, y_data)
+            return np.random.permutation(data_len)[:data_size]
+
+        return np.arange(data_size)
+
+    def get_data(self, attr_name: str,
+        sample_size: int=None,
+        shuffle: bool=False,
+        stratify: bool=False
+    ):
+        '''Returns the data and labels of a set (train, test or valid).
+
+        Without shuffle and stratify the result is a view of the first
+        instances. Otherwise, only the sampled instances are gathered.'''
+
+        if attr_name not in ['train', 'test', 'valid']:
+            raise ValueError(f'Unknown set name: {attr_name}')
+
+        x_data = getattr(self, f'x_{attr_name}')
+        y_data = getattr(self, f'y_{attr_name}')
+
+        indexes = self.get_indexes(attr_name, sample_size, shuffle, stratify)
+
+        if shuffle or stratify:
+            return x_data[indexes], y_data[indexes]
+
+        return x_data[:len(indexes)], y_data[:len(indexes)]
+
+    def get_sequence(self, attr_name: str,
+        batch_size: int,
+        indexes: np.ndarray=None,
+        shuffle: bool=False,
+        prefetch: int=2,
+        categorical: bool=False
+    ) -> BatchSequence:
+        '''Returns a BatchSequence over the data, which can be used in place
+        of the arrays for training and evaluation. Batches are only gathered
+        (or decoded) when requested.
+
+        # Parameters
+        - attr_name: train, test or valid
+        - batch_size: number of instances per batch
+        - indexes: instances used (default get_indexes(attr_name)), use
+        get_indexes to draw random or stratified samples without copying data
+        - shuffle: shuffles the indexes at the end of each epoch
+        - prefetch: number of batches loaded in advance by threads
+        - categorical: converts sparse labels to categorical per batch'''
+
+        if indexes is None:
+            indexes = self.get_indexes(attr_name)
+
+        x_data = getattr(self, f'x_{attr_name}')
+        y_data = getattr(self, f'y_{attr_name}')
+
+        num_classes = None
+        if categorical and self.sparse_labels:
+            num_classes = self.num_classes
+
+        return BatchSequence(x_data, y_data, batch_size, shuffle, prefetch,
+            indexes, num_classes)
+
+    def get_patches(self, attr_name: str,
+        patch_size: tuple,
+        batch_size: int,
+        mode: str='random',
+        n_patches: int=None,
+        stride: tuple=None,
+        indexes: np.ndarray=None
+    ) -> PatchSequence:
+        '''Returns a PatchSequence over the images (and masks) of a set, used
+        to train segmentation models with a bounded memory footprint.
+        See PatchSequence for the parameters.'''
+
+        if indexes is None:
+            indexes = self.get_indexes(attr_name)
+
+        x_data = getattr(self, f'x_{attr_name}')
+        y_data = getattr(self, f'y_{attr_name}')
+
+        return PatchSequence(x_data, y_data, patch_size, batch_size, mode,
+            n_patches, stride, indexes)
+
+    def subset(self, attr_name: str, indexes: np.ndarray) -> 'Dataset':
+        '''Returns a copy of the dataset in which a set (train, test or valid)
+        is replaced by a view of the given indexes. Data is not copied.'''
+
+        if attr_name not in ['train', 'test', 'valid']:
+            raise ValueError(f'Unknown set name: {attr_name}')
+
+        dataset = Dataset.__new__(Dataset)
+        dataset.__dict__.update(self.__dict__)
+
+        setattr(dataset, f'x_{attr_name}', IndexedView(getattr(self, f'x_{attr_name}'), indexes))
+        setattr(dataset, f'y_{attr_name}', IndexedView(getattr(self, f'y_{attr_name}'), indexes))
+        setattr(dataset, f'{attr_name}_size', len(indexes))
+
+        return dataset
+
+
+def pickle_to_npy(pickle_file: str, npy_folder: str) -> str:
+    '''Converts a pickled dataset (the format read by Dataset.from_pickle)
+    to the folder layout read by Dataset.from_npy.
+
+    Arrays are saved as individual .npy files, other values (input_shape,
+    num_classes, ...) are saved in info.json. The data is stored as it is
+    in the pickle file, so both loaders accept the same arguments.'''
+
+    with open(pickle_file, 'rb') as file:
+        data_dict = pickle.load(file)
+
+    if not os.path.exists(npy_folder):
+        os.makedirs(npy_folder)
+
+    info = {}
+    for key, value in data_dict.items():
+        if key in DATA_KEYS:
+            np.save(os.path.join(npy_folder, f'{key}.npy'), np.asarray(value))
+        else:
+            info[key] = value
+    _write_info(npy_folder, info)
+
+    return npy_folder
+
+
+def downsample(data, factor: int, mask: bool=False, chunk_size: int=256) -> np.ndarray:
+    '''Reduces the resolution of images (n, height, width, ...) by averaging
+    blocks of factor x factor pixels. Borders that do not fit in a block
+    are cropped. Masks are binarized after the average.
+
+    The data is processed in chunks, so memory-mapped sources are not
+    loaded at once.'''
+
+    height, width = np.shape(data[0])[:2]
+    height, width = height // factor * factor, width // factor * factor
+
+    chunks = []
+    for start in range(0, len(data), chunk_size):
+        chunk = data[np.arange(start, min(start+chunk_size, len(data)))][:, :height, :width]
+        shape = (len(chunk), height // factor, factor, width // factor, factor) + chunk.shape[3:]
+        reduced = chunk.reshape(shape).mean(axis=(2, 4))
+        if mask:
+            reduced = reduced >= 0.5
+        chunks.append(reduced.astype(chunk.dtype))
+
+    return np.concatenate(chunks)
+
+
+def _write_info(npy_folder: str, info: dict):
+    with open(os.path.join(npy_folder, INFO_NAME), 'w') as file:
+        # numpy values (e.g. np.int64) are stored as python types
+        json.dump(info, file, default=lambda value: value.tolist())
+
+
+def _read_info(npy_folder: str) -> dict:
+    # reads the non-array arguments stored alongside the .npy files
+    info_file = os.path.join(npy_folder, INFO_NAME)
+    if not os.path.exists(info_file):
+        return {}
+
+    with open(info_file) as file:
+        info = json.load(file)
+
+    # json has no tuples
+    if info.get('input_shape') is not None:
+        info['input_shape'] = tuple(info['input_shape'])
 
-        return x_data[:data_size], y_data[:data_size]
+    return info
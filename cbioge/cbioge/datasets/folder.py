@@ -0,0 +1,88 @@
+import os
+from typing import Union
+
+import numpy as np
+
+from skimage import io
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.npy')
+
+
+class ImageFolder:
+    '''Array-like view of the images stored in a folder.
+
+    Images are decoded only when accessed, which allows the Dataset class to
+    work with folders that do not fit in memory. Indexing follows numpy:
+    - integer: returns one decoded image
+    - slice: returns a new ImageFolder with the selected files (nothing is decoded)
+    - list of integers: returns the decoded images stacked in one array
+
+    # Parameters
+    - folder: path to the images (files are sorted by name)
+    - files: list of file names inside the folder (default all images found)
+    - dtype: type of the decoded arrays
+    - scale: if defined, decoded values are divided by it (ex: 255)
+    - cache: keeps the decoded images in memory (shared with slices)'''
+
+    def __init__(self, folder: str,
+        files: list=None,
+        dtype: str='float32',
+        scale: float=None,
+        cache: Union[bool, dict]=False
+    ):
+
+        self.folder = folder
+        self.dtype = dtype
+        self.scale = scale
+
+        if files is None:
+            files = sorted(f for f in os.listdir(folder)
+                if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.files = files
+
+        if isinstance(cache, dict):
+            self.cache = cache
+        else:
+            self.cache = {} if cache else None
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ImageFolder(self.folder, self.files[index],
+                self.dtype, self.scale, self.cache)
+
+        if isinstance(index, (int, np.integer)):
+            return self._read(self.files[index])
+
+        return np.stack([self._read(self.files[i]) for i in index])
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self),) + self[0].shape
+
+    def _read(self, file_name: str) -> np.ndarray:
+
+        if self.cache is not None and file_name in self.cache:
+            return self.cache[file_name]
+
+        path = os.path.join(self.folder, file_name)
+        if file_name.endswith('.npy'):
+            image = np.load(path)
+        else:
+            image = io.imread(path)
+
+        image = image.astype(self.dtype)
+        if self.scale is not None:
+            image /= self.scale
+
+        # grayscale images and masks have an explicit channel
+        if image.ndim == 2:
+            image = image[..., np.newaxis]
+
+        if self.cache is not None:
+            self.cache[file_name] = image
+
+        return image
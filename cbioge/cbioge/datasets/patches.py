@@ -0,0 +1,106 @@
+import numpy as np
+
+from keras.utils import Sequence
+
+
+class PatchSequence(Sequence):
+    '''Keras Sequence of patches (crops) extracted from images and their
+    segmentation masks. Patches are only extracted when a batch is requested,
+    so memory usage depends on the patch and batch sizes, not on the size
+    of the images.
+
+    # Parameters
+    - x_data: images (n, height, width, channels), numpy arrays, memmaps or
+    other array-like data (ex: ImageFolders)
+    - y_data: masks with the same height and width of the images
+    - patch_size: (height, width) of the patches
+    - batch_size: number of patches per batch
+    - mode: random (new random patches each epoch) | grid (all the patches
+    in a regular grid, in order)
+    - n_patches: number of patches per epoch in random mode (default one per image)
+    - stride: step between patches in grid mode (default patch_size, no overlap)
+    - indexes: indexes of the images used (default all of them)'''
+
+    def __init__(self, x_data, y_data=None,
+        patch_size: tuple=(64, 64),
+        batch_size: int=32,
+        mode: str='random',
+        n_patches: int=None,
+        stride: tuple=None,
+        indexes: np.ndarray=None
+    ):
+
+        if mode not in ['random', 'grid']:
+            raise ValueError(f'Unknown patch mode: {mode}')
+
+        self.x_data = x_data
+        self.y_data = y_data
+
+        self.patch_size = tuple(patch_size)
+        self.batch_size = batch_size
+        self.mode = mode
+        self.stride = tuple(stride or patch_size)
+
+        if indexes is None:
+            indexes = np.arange(len(x_data))
+        self.indexes = np.asarray(indexes)
+        self.n_patches = n_patches or len(self.indexes)
+
+        self.image_size = np.shape(x_data[0])[:2]
+        if any(p > s for p, s in zip(self.patch_size, self.image_size)):
+            raise ValueError(f'Patch {self.patch_size} larger than image {self.image_size}')
+
+        # (image, row, col) of each patch
+        self.patches = self._grid_patches() if mode == 'grid' else self._random_patches()
+
+    def __len__(self):
+        return int(np.ceil(len(self.patches) / self.batch_size))
+
+    def __getitem__(self, index):
+
+        batch = self.patches[index*self.batch_size:(index+1)*self.batch_size]
+
+        # patches are read by image (consecutive reads of the same image),
+        # the batch keeps its (random) order
+        x_batch = [None] * len(batch)
+        y_batch = [None] * len(batch)
+        for i in np.argsort(batch[:, 0], kind='stable'):
+            x_batch[i] = self._crop(self.x_data, *batch[i])
+            if self.y_data is not None:
+                y_batch[i] = self._crop(self.y_data, *batch[i])
+
+        if self.y_data is None:
+            return np.stack(x_batch)
+        return np.stack(x_batch), np.stack(y_batch)
+
+    def on_epoch_end(self):
+        if self.mode == 'random':
+            self.patches = self._random_patches()
+
+    def _crop(self, data, image: int, row: int, col: int) -> np.ndarray:
+        height, width = self.patch_size
+        # numpy arrays (and memmaps) read only the patch region
+        if isinstance(data, np.ndarray):
+            return data[image, row:row+height, col:col+width]
+        return data[image][row:row+height, col:col+width]
+
+    def _random_patches(self) -> np.ndarray:
+        images = np.random.choice(self.indexes, self.n_patches)
+        rows = np.random.randint(0, self.image_size[0] - self.patch_size[0] + 1, self.n_patches)
+        cols = np.random.randint(0, self.image_size[1] - self.patch_size[1] + 1, self.n_patches)
+        return np.stack([images, rows, cols], axis=1)
+
+    def _grid_patches(self) -> np.ndarray:
+        rows = grid_positions(self.image_size[0], self.patch_size[0], self.stride[0])
+        cols = grid_positions(self.image_size[1], self.patch_size[1], self.stride[1])
+        return np.array([(i, r, c) for i in self.indexes for r in rows for c in cols])
+
+
+def grid_positions(size: int, patch: int, stride: int) -> list:
+    '''Start positions of patches along one axis. The last patch is aligned
+    to the border, so the whole axis is covered.'''
+
+    positions = list(range(0, size - patch + 1, stride))
+    if positions[-1] != size - patch:
+        positions.append(size - patch)
+    return positions
@@ -0,0 +1,156 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+from skimage import transform
+
+from .dataset import Dataset
+
+
+CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.cache', 'cbioge')
+HASHES_NAME = 'hashes.json'
+DONE_NAME = 'done'
+
+
+def preprocess(source: str,
+    cache_folder: str=None,
+    normalize: str=None,
+    resize: tuple=None,
+    **kwargs
+) -> Dataset:
+    '''Loads a dataset applying the preprocessing steps, and caches the
+    result as memory-mappable arrays (see Dataset.from_npy).
+
+    The cache entry is identified by the content hash of the source file
+    and the preprocessing parameters, so following calls with the same
+    arguments only open the cached arrays.
+
+    # Parameters
+    - source: pickle (see Dataset.from_pickle) or .npz file
+    - cache_folder: folder that holds the cache (default CACHE_FOLDER)
+    - normalize: minmax | standard, statistics are taken from the train set
+    - resize: (height, width) of the images (labels with the same size as
+    the images are resized as well)
+
+    # Optional
+    kwargs: Dataset arguments, such as train_size, valid_split,
+    num_classes or sparse_labels (split and one-hot are cached too)'''
+
+    cache_folder = cache_folder or CACHE_FOLDER
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder)
+
+    params = dict(kwargs, normalize=normalize, resize=resize)
+    key = _cache_key(_file_hash(source, cache_folder), params)
+    npy_folder = os.path.join(cache_folder, key)
+
+    if not os.path.exists(os.path.join(npy_folder, DONE_NAME)):
+        if source.endswith('.npz'):
+            dataset = Dataset.from_npy(source, **kwargs)
+        else:
+            dataset = Dataset.from_pickle(source, **kwargs)
+
+        if resize is not None:
+            resize_images(dataset, tuple(resize))
+        if normalize is not None:
+            normalize_images(dataset, normalize)
+
+        # writes to a temporary folder first, so concurrent launches never
+        # read an incomplete entry
+        tmp_folder = f'{npy_folder}.{os.getpid()}.tmp'
+        dataset.to_npy(tmp_folder)
+        open(os.path.join(tmp_folder, DONE_NAME), 'w').close()
+        try:
+            os.rename(tmp_folder, npy_folder)
+        except OSError:
+            # another process created the same entry
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+
+    return Dataset.from_npy(npy_folder)
+
+
+def normalize_images(dataset: Dataset, mode: str='minmax'):
+    '''Normalizes the data of all sets using the statistics of the train set.
+
+    # Parameters
+    - mode: minmax scales to [0, 1], standard scales to zero mean and unit variance'''
+
+    x_train, _ = dataset.get_data('train')
+    if mode == 'minmax':
+        shift = np.min(x_train)
+        scale = np.max(x_train) - shift
+    elif mode == 'standard':
+        shift = np.mean(x_train)
+        scale = np.std(x_train)
+    else:
+        raise ValueError(f'Unknown normalization: {mode}')
+
+    # python floats keep the data as float32
+    shift = float(shift)
+    scale = float(scale) or 1.0
+    for attr_name in ['train', 'test', 'valid']:
+        x_data = getattr(dataset, f'x_{attr_name}')
+        if x_data is not None:
+            x_data = (np.asarray(x_data, dtype='float32') - shift) / scale
+            setattr(dataset, f'x_{attr_name}', x_data)
+
+
+def resize_images(dataset: Dataset, size: tuple):
+    '''Resizes the images (and segmentation masks) of all sets.
+    Masks use nearest neighbor interpolation to keep their values.'''
+
+    for attr_name in ['train', 'test', 'valid']:
+        x_data = getattr(dataset, f'x_{attr_name}')
+        y_data = getattr(dataset, f'y_{attr_name}')
+        if x_data is None:
+            continue
+
+        is_mask = np.ndim(y_data[0]) > 1 and y_data[0].shape[:2] == x_data[0].shape[:2]
+
+        setattr(dataset, f'x_{attr_name}', _resize(x_data, size, order=1))
+        if is_mask:
+            setattr(dataset, f'y_{attr_name}', _resize(y_data, size, order=0))
+
+    dataset.input_shape = size + dataset.input_shape[2:]
+
+
+def _resize(data, size: tuple, order: int) -> np.ndarray:
+    return np.stack([transform.resize(image, size + image.shape[2:], order=order,
+        preserve_range=True, anti_aliasing=order > 0) for image in data]).astype(data.dtype)
+
+
+def _cache_key(file_hash: str, params: dict) -> str:
+    # numpy values (e.g. np.int64) are stored as python types
+    text = json.dumps(params, sort_keys=True, default=lambda value: value.tolist())
+    return hashlib.sha1(f'{file_hash}{text}'.encode()).hexdigest()
+
+
+def _file_hash(file_name: str, cache_folder: str) -> str:
+    # hashing multi-GB files takes a while, so the hash is stored and only
+    # recomputed if the file changes (path, size and modification time)
+    stat = os.stat(file_name)
+    file_id = f'{os.path.abspath(file_name)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    hashes_file = os.path.join(cache_folder, HASHES_NAME)
+    hashes = {}
+    if os.path.exists(hashes_file):
+        with open(hashes_file) as file:
+            hashes = json.load(file)
+
+    if file_id not in hashes:
+        sha1 = hashlib.sha1()
+        with open(file_name, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha1.update(chunk)
+        hashes[file_id] = sha1.hexdigest()
+
+        # replaced in one step, so concurrent launches never read half of it
+        tmp_file = f'{hashes_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump(hashes, file)
+        os.replace(tmp_file, hashes_file)
+
+    return hashes[file_id]
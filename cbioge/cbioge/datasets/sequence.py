@@ -0,0 +1,118 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from keras.utils import Sequence, to_categorical
+
+
+class BatchSequence(Sequence):
+    '''Keras Sequence that gathers the batches from array-like data
+    (numpy arrays, memmaps or ImageFolders) only when they are requested.
+
+    When prefetch is greater than 0, the next batches are loaded by a pool
+    of threads while the current one is being consumed.
+
+    # Parameters
+    - x_data: data
+    - y_data: labels (None to return only the data, ex: predictions)
+    - batch_size: number of instances per batch
+    - shuffle: shuffles the order of the instances at the end of each epoch
+    - prefetch: number of batches loaded in advance (and number of threads)
+    - indexes: indexes of the instances used (default all of them)
+    - num_classes: if defined, integer labels are converted to categorical
+    (one-hot) per batch'''
+
+    def __init__(self, x_data, y_data=None,
+        batch_size: int=32,
+        shuffle: bool=False,
+        prefetch: int=0,
+        indexes: np.ndarray=None,
+        num_classes: int=None
+    ):
+
+        self.x_data = x_data
+        self.y_data = y_data
+
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.prefetch = prefetch
+        self.num_classes = num_classes
+
+        if indexes is None:
+            indexes = np.arange(len(x_data))
+        self.indexes = np.array(indexes)
+        if self.shuffle:
+            np.random.shuffle(self.indexes)
+
+        # the pool is created on the first (prefetched) batch
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(np.ceil(len(self.indexes) / self.batch_size))
+
+    def __getitem__(self, index):
+
+        if self.prefetch <= 0:
+            return self._load_batch(index)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.prefetch)
+
+            future = self._pending.pop(index, None)
+            if future is None:
+                future = self._executor.submit(self._load_batch, index)
+
+            # schedules the next batches while this one is consumed
+            for next_index in range(index+1, min(index+1+self.prefetch, len(self))):
+                if next_index not in self._pending:
+                    self._pending[next_index] = self._executor.submit(
+                        self._load_batch, next_index)
+
+        return future.result()
+
+    def on_epoch_end(self):
+
+        with self._lock:
+            # batches prefetched with the old order are not valid anymore
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+
+            if self.shuffle:
+                np.random.shuffle(self.indexes)
+
+    def close(self):
+        '''Stops the prefetch threads (they are started again if more
+        batches are requested).'''
+
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def __del__(self):
+        self.close()
+
+    def _load_batch(self, index: int):
+
+        batch = self.indexes[index*self.batch_size:(index+1)*self.batch_size]
+
+        # predictions must follow the order of the indexes
+        if self.y_data is None:
+            return self.x_data[batch]
+
+        # sorted indexes keep reads from disk (almost) sequential
+        batch = np.sort(batch)
+        y_batch = self.y_data[batch]
+        if self.num_classes is not None:
+            y_batch = to_categorical(y_batch, self.num_classes)
+
+        return self.x_data[batch], y_batch
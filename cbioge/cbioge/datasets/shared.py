@@ -0,0 +1,123 @@
+import sys
+import weakref
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: # python < 3.8
+    shared_memory = None
+
+import numpy as np
+
+
+# blocks attached by this process, the views are only valid while open
+_ATTACHED = {}
+
+
+class SharedArrays:
+    '''Publishes numpy arrays in shared memory blocks, so other processes
+    can attach zero-copy views of them by name (see attach_arrays).
+
+    The process that creates the object owns the blocks. They are unlinked
+    when close() is called, when the object is garbage collected, or when
+    the interpreter exits. If the owner is killed, the leaked blocks are
+    removed by the multiprocessing resource tracker.
+
+    Before python 3.13 the blocks attached by workers are also registered
+    with the resource tracker. Workers started by multiprocessing share the
+    tracker of the owner, so nothing changes, but other processes unlink
+    the blocks they attached to when they exit.
+
+    Shared memory requires python 3.8 or newer.
+
+    # Parameters
+    - arrays: dict of name/array to be published
+    - info: small picklable values sent along with the arrays
+
+    The spec attribute holds everything a worker needs to attach to the
+    arrays and can be sent through pipes and queues.'''
+
+    def __init__(self, arrays: dict, info: dict=None):
+
+        _check_support()
+
+        self.blocks = {}
+        self.spec = {'arrays': {}, 'info': info or {}}
+
+        try:
+            for key, array in arrays.items():
+                array = np.asarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+
+                self.blocks[key] = block
+                self.spec['arrays'][key] = (block.name, array.shape, array.dtype.str)
+        except Exception:
+            _release(list(self.blocks.values()))
+            raise
+
+        self._finalizer = weakref.finalize(self, _release, list(self.blocks.values()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def arrays(self) -> dict:
+        return {key: np.ndarray(shape, dtype, buffer=self.blocks[key].buf)
+            for key, (_, shape, dtype) in self.spec['arrays'].items()}
+
+    def close(self):
+        '''Unlinks the blocks. Views attached by other processes stay valid
+        until they are detached, but new attachments will fail.'''
+        self._finalizer()
+
+
+def attach_arrays(spec: dict) -> dict:
+    '''Attaches to the blocks described by SharedArrays.spec and returns
+    read-only numpy views of them. No data is copied.'''
+
+    _check_support()
+
+    arrays = {}
+    for key, (name, shape, dtype) in spec['arrays'].items():
+        if name not in _ATTACHED:
+            _ATTACHED[name] = _open_block(name)
+        view = np.ndarray(shape, dtype, buffer=_ATTACHED[name].buf)
+        view.flags.writeable = False
+        arrays[key] = view
+    return arrays
+
+
+def detach_arrays(spec: dict):
+    '''Closes the blocks attached by this process. Views obtained from
+    attach_arrays must not be used after this call.'''
+
+    for name, _, _ in spec['arrays'].values():
+        block = _ATTACHED.pop(name, None)
+        if block is not None:
+            block.close()
+
+
+def _check_support():
+    if shared_memory is None:
+        raise RuntimeError('Shared memory datasets require python 3.8 or newer '
+            f'(running {sys.version.split()[0]})')
+
+
+def _open_block(name: str):
+    # from 3.13 only the owner tracks (and unlinks) the block, before that
+    # the block is also registered by the process that attaches to it
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _release(blocks: list):
+    for block in blocks:
+        block.close()
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
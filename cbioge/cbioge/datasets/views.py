@@ -0,0 +1,40 @@
+import numpy as np
+
+
+class IndexedView:
+    '''Array-like view of a subset of an array, defined by an index array.
+
+    No data is copied when the view is created or sliced, instances are only
+    gathered when accessed. Indexing follows numpy:
+    - integer: returns one instance
+    - slice: returns a new IndexedView with the selected indexes
+    - list of integers: returns the instances gathered in one array
+
+    # Parameters
+    - data: array-like data (numpy arrays, memmaps, ImageFolders, ...)
+    - indexes: indexes of the data that belong to the view'''
+
+    def __init__(self, data, indexes: np.ndarray):
+        # avoids chaining views of views
+        if isinstance(data, IndexedView):
+            indexes = data.indexes[indexes]
+            data = data.data
+
+        self.data = data
+        self.indexes = np.asarray(indexes)
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return IndexedView(self.data, self.indexes[index])
+
+        if isinstance(index, (int, np.integer)):
+            return self.data[self.indexes[index]]
+
+        return self.data[self.indexes[np.asarray(index)]]
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self),) + self.data[0].shape
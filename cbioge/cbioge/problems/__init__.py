@@ -1,5 +1,22 @@
-from .problem import BaseProblem
-from .problem import DNNProblem
+from .base import BaseProblem
 
-from .classification.cnn import CNNProblem
-from .segmentation.unet import UNetProblem
+from .synthetic import AnalyticProblem
+from .synthetic import LookupProblem
+
+# problems of neural networks import keras (and tensorflow), they are
+# only loaded when used, so the other problems do not require them
+_KERAS_PROBLEMS = {
+    'DNNProblem': '.problem',
+    'CNNProblem': '.classification.cnn',
+    'UNetProblem': '.segmentation.unet',
+}
+_SUBMODULES = ['classification', 'dnns', 'problem', 'segmentation', 'workers']
+
+
+def __getattr__(name):
+    import importlib # pylint: disable=import-outside-toplevel
+    if name in _KERAS_PROBLEMS:
+        return getattr(importlib.import_module(_KERAS_PROBLEMS[name], __name__), name)
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,39 @@
+import logging
+from typing import Any
+from abc import ABC, abstractmethod
+
+from ..algorithms import Solution
+from ..grammars import Grammar
+
+
+class BaseProblem(ABC):
+    '''BaseProblem class that works as a reference of what a problem class must
+    have to be used with the evolutionary algorithms.
+
+    Child classes must implement map_genotype_to_phenotype and evaluate.'''
+
+    def __init__(self, parser: Grammar, verbose: bool=False):
+        if parser is None:
+            raise AttributeError('Grammar parser cannot be None')
+
+        self.parser = parser
+        self.verbose = verbose
+        self.logger = logging.getLogger('cbioge')
+
+        # fitness needed to enter the population (set by the algorithm)
+        self.fitness_threshold = None
+
+    @abstractmethod
+    def map_genotype_to_phenotype(self, solution: Solution) -> Any:
+        raise NotImplementedError('Not implemented yet.')
+
+    @abstractmethod
+    def evaluate(self, solution: Solution):
+        raise NotImplementedError('Not implemented yet.')
+
+    def estimate_cost(self, solution: Solution) -> float: # pylint: disable=unused-argument
+        '''Relative cost of evaluating a solution, used to share resources
+        between evaluations (see workers.CoreScheduler).
+        Child classes may estimate it from the mapping of the solution.'''
+
+        return 1.0
@@ -1,12 +1,15 @@
 from typing import Union
 
+import numpy as np
+
 from keras.layers import Input, Flatten, Dense
 from keras.models import Model
 
 from ..dnns import layers as clayers
+from ...algorithms import Solution
 from ...datasets import Dataset
 from ...grammars import Grammar
-from ...problems import DNNProblem
+from ..problem import DNNProblem
 
 
 class CNNProblem(DNNProblem):
@@ -22,11 +25,54 @@ class CNNProblem(DNNProblem):
         test_eval: bool=False,
         verbose: bool=False,
         train_args: dict={},
-        test_args: dict={}
+        test_args: dict={},
+        **kwargs
     ):
 
         super().__init__(parser, dataset, batch_size, epochs, opt, loss,
-            metrics, test_eval, verbose, train_args, test_args)
+            metrics, test_eval, verbose, train_args, test_args, **kwargs)
+
+    def _count_macs(self, reshaped_mapping: list) -> int:
+        '''Number of multiply-accumulate operations (per instance) of the
+        convolutional and dense layers of a reshaped mapping, classifier
+        included. Shapes follow the keras defaults (valid padding, strides
+        of 1 for convolutions and of the pool size for poolings).'''
+
+        shape = tuple(self.dataset.input_shape)
+        macs = 0
+        for name, *values in reshaped_mapping:
+            config = {param: value for param, value in zip(values[::2], values[1::2])}
+            if name in ['Conv2D', 'MaxPooling2D', 'AveragePooling2D'] and len(shape) == 3:
+                if name == 'Conv2D':
+                    kernel = _pair(config['kernel_size'])
+                    strides = _pair(config.get('strides', 1))
+                else:
+                    kernel = _pair(config.get('pool_size', 2))
+                    strides = _pair(config.get('strides') or kernel)
+                size = [-(-dim // stride) if config.get('padding') == 'same'
+                    else (dim - k) // stride + 1
+                    for dim, k, stride in zip(shape[:2], kernel, strides)]
+                if min(size) < 1:
+                    return 0
+                channels = config['filters'] if name == 'Conv2D' else shape[2]
+                if name == 'Conv2D':
+                    macs += size[0] * size[1] * channels * kernel[0] * kernel[1] * shape[2]
+                shape = (size[0], size[1], channels)
+            elif name == 'Dense':
+                macs += int(np.prod(shape)) * config['units']
+                shape = shape[:-1] + (config['units'],)
+            elif name == 'Flatten':
+                shape = (int(np.prod(shape)),)
+
+        return macs + int(np.prod(shape)) * self.dataset.num_classes
+
+    def estimate_cost(self, solution: Solution) -> float:
+        # the cost is proportional to the operations of the model, counted
+        # from the mapping (the model is not built)
+        mapping = solution.data.get('mapping')
+        if mapping is None:
+            mapping = self.parser.recursive_parse(solution.genotype)
+        return float(max(self._count_macs(self._reshape_mapping(mapping)), 1))
 
     def _build_model(self, mapping: list) -> Model:
 
@@ -57,3 +103,8 @@ class CNNProblem(DNNProblem):
         except ValueError:
             self.logger.exception('Invalid model')
             return None
+
+
+def _pair(value) -> tuple:
+    # keras accepts an int or a tuple for sizes and strides
+    return tuple(value) if isinstance(value, (list, tuple)) else (value, value)
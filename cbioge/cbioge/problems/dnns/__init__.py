@@ -1,3 +1,5 @@
 from . import callbacks
 from . import image_metrics
 from . import layers
+from . import np_metrics
+from . import profiling
@@ -1,4 +1,6 @@
 import datetime as dt
+
+import numpy as np
 from keras.callbacks import Callback
 
 
@@ -40,3 +42,89 @@ class EpochReport(Callback):
             if 'val_loss' in logs:
                 text += f' val_loss {logs["val_loss"]} - val_acc {logs["val_acc"]}'
             print(text)
+
+
+def fit_learning_curve(values: list, epoch: int, curve: str='power') -> float:
+    '''Predicts the value of a learning curve at a (future) epoch.
+
+    The curve y = a + b * f(t) is fitted by least squares for a range of
+    decay rates c, with f(t) = t^-c (power) or f(t) = exp(-c*t) (exp), and
+    the best fit is used. Epochs start at 1.'''
+
+    if curve not in ['power', 'exp']:
+        raise ValueError(f'Unknown curve: {curve}')
+
+    values = np.asarray(values, dtype='float64')
+    epochs = np.arange(1, len(values) + 1, dtype='float64')
+    if len(values) < 2:
+        return float(values[-1])
+
+    times = np.append(epochs, epoch)
+    best_error, prediction = np.inf, float(values[-1])
+    for rate in np.linspace(0.05, 2.0, 40):
+        decay = times ** -rate if curve == 'power' else np.exp(-rate * times)
+        basis = np.stack([np.ones_like(epochs), decay[:-1]], axis=1)
+        coef, *_ = np.linalg.lstsq(basis, values, rcond=None)
+        error = np.sum((basis @ coef - values) ** 2)
+        if error < best_error:
+            best_error = error
+            prediction = float(coef[0] + coef[1] * decay[-1])
+    return prediction
+
+
+class LearningCurveStopping(Callback):
+    ''' Stop training when the predicted final value of a metric (from
+        the partial learning curve) cannot reach a threshold, ex: the
+        fitness needed to enter the population.
+        Verification is made at each epoch end.
+
+        # Arguments
+        threshold: value that must be reached (None never stops), only
+        for metrics where higher is better
+        monitor: metric of the logs (higher is better)
+        min_epochs: epochs before the first prediction
+        margin: tolerance added to the prediction
+        curve: 'power' or 'exp' (see fit_learning_curve)
+        verbose: verbosity mode'''
+
+    def __init__(self, threshold=None, monitor='val_acc', min_epochs=3,
+        margin=0.0, curve='power', verbose=0):
+        super().__init__()
+
+        self.threshold = threshold
+        self.monitor = monitor
+        self.min_epochs = min_epochs
+        self.margin = margin
+        self.curve = curve
+        self.verbose = verbose
+
+        self.values = []
+        self.prediction = None
+        self.stopped_epoch = None
+
+    def on_train_begin(self, logs=None):
+        self.values = []
+        self.prediction = None
+        self.stopped_epoch = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        if logs is None or self.monitor not in logs:
+            return
+
+        self.values.append(logs[self.monitor])
+        if len(self.values) < self.min_epochs:
+            return
+
+        # noisy curves may be extrapolated down, the best value seen
+        # is a lower bound for the prediction
+        final = self.params.get('epochs', len(self.values))
+        self.prediction = max(max(self.values),
+            fit_learning_curve(self.values, final, self.curve))
+
+        if self.threshold is not None \
+            and self.prediction + self.margin < self.threshold:
+            self.model.stop_training = True
+            self.stopped_epoch = epoch
+            if self.verbose:
+                print('Stopping at epoch %s, predicted %s: %.4f (needed %.4f).'
+                    % (epoch, self.monitor, self.prediction, self.threshold))
@@ -43,6 +43,35 @@ def dice_coef(y_true, y_pred):
     return (2. * intersection +smooth) / (K.sum(y_true_f) + K.sum(y_pred_f) +smooth)
 
 
+def fused_measures(y_true, y_pred):
+    '''Computes jaccard (as in jaccard_distance), dice, specificity and
+    sensitivity at once. The sums shared by them (y_true*y_pred, sum of
+    labels and predictions) are reduced only once per batch.'''
+
+    product = y_true * y_pred
+
+    # jaccard is calculated along the last axis (smooth=100)
+    intersection = K.sum(K.abs(product), axis=-1)
+    sum_ = K.sum(K.abs(y_true) + K.abs(y_pred), axis=-1)
+    jac = (intersection + 100) / (sum_ - intersection + 100)
+    jac = 1-((1 - jac) * 100)
+
+    tp_ = K.sum(product)
+    sum_true = K.sum(y_true)
+    sum_pred = K.sum(y_pred)
+    count = K.cast(K.prod(K.shape(y_true)), K.floatx())
+
+    fp_ = sum_pred - tp_
+    fn_ = sum_true - tp_
+    tn_ = count - sum_true - fp_
+
+    dice = (2. * tp_ + 1) / (sum_true + sum_pred + 1)
+    spe = tn_ / (tn_ + fp_)
+    sen = tp_ / (tp_ + fn_)
+
+    return jac, dice, spe, sen
+
+
 #losses
 def iou_loss(y_true, y_pred):
 
@@ -57,10 +86,12 @@ def dice_coef_loss(y_true, y_pred):
 #composed measure
 def weighted_measures(y_true, y_pred, w1=.3, w2=.05, w3=.35, w4=.3):
 
-    return w1 * (1 - jaccard_distance(y_true, y_pred)) \
-         + w2 * specificity(y_true, y_pred) \
-         + w3 * sensitivity(y_true, y_pred) \
-         + w4 * dice_coef(y_true, y_pred)
+    jac, dice, spe, sen = fused_measures(y_true, y_pred)
+
+    return w1 * (1 - jac) \
+         + w2 * spe \
+         + w3 * sen \
+         + w4 * dice
 
 
 def weighted_measures_loss(y_true, y_pred, w1=.3, w2=.05, w3=.35, w4=.3):
@@ -80,15 +111,26 @@ class WeightedMetric:
         return 'weighted_metric'
 
     def acc(self, y_true, y_pred):
-        return self.w_jac * (1 - jaccard_distance(y_true, y_pred))\
-            + self.w_dic * dice_coef(y_true, y_pred)\
-            + self.w_spe * specificity(y_true, y_pred)\
-            + self.w_sen * sensitivity(y_true, y_pred)
+        jac, dice, spe, sen = fused_measures(y_true, y_pred)
+
+        return self.w_jac * (1 - jac)\
+            + self.w_dic * dice\
+            + self.w_spe * spe\
+            + self.w_sen * sen
 
     def loss(self, y_true, y_pred):
 
         return 1 - self.acc(y_true, y_pred)
 
+    def combine(self, results: dict) -> float:
+        '''Same as acc, using the values calculated by
+        np_metrics.MetricAccumulator for the whole dataset.'''
+
+        return self.w_jac * (1 - results['jaccard'])\
+            + self.w_dic * results['dice']\
+            + self.w_spe * results['specificity']\
+            + self.w_sen * results['sensitivity']
+
     def get_metric(self):
 
         return self.acc
@@ -0,0 +1,250 @@
+'''NumPy counterparts of the image_metrics functions.
+
+The metrics are calculated from sums accumulated chunk by chunk, so the
+values are exact for the whole dataset (model.evaluate averages the values
+of each batch instead), and large (memory-mapped) prediction files can be
+scored without TensorFlow.'''
+import numpy as np
+
+
+EPSILON = 1e-7
+
+# names of the keras metrics/losses and the key (or function) of the result
+METRIC_NAMES = {
+    'acc': 'accuracy',
+    'accuracy': 'accuracy',
+    'binary_accuracy': 'accuracy',
+    'binary_crossentropy': 'binary_crossentropy',
+    'iou_accuracy': 'iou',
+    'jaccard_distance': 'jaccard',
+    'dice_coef': 'dice',
+    'specificity': 'specificity',
+    'sensitivity': 'sensitivity',
+    'iou_loss': lambda r: 1 - r['iou'],
+    'dice_coef_loss': lambda r: 1 - r['dice'],
+    'weighted_measures': lambda r: weighted_results(r),
+    'weighted_measures_loss': lambda r: 1 - weighted_results(r),
+}
+
+
+class MetricAccumulator:
+    '''Accumulates, over batches, the sums used by the image metrics:
+    true positives, sums of labels and predictions, and the per-element
+    values of jaccard, accuracy and binary crossentropy.
+
+    Positives are soft (y_true * y_pred), as in the keras functions.
+    Use threshold to binarize the predictions first, and per_image to keep
+    the sums of each image (results then returns arrays).'''
+
+    def __init__(self, threshold: float=None, per_image: bool=False):
+        self.threshold = threshold
+        self.per_image = per_image
+        self.reset()
+
+    def reset(self):
+        self.sums = None
+
+    def update(self, y_true, y_pred):
+        if self.threshold is not None:
+            y_pred = np.asarray(y_pred) >= self.threshold
+
+        sums = image_sums(y_true, y_pred)
+        if not self.per_image:
+            sums = {key: value.sum() for key, value in sums.items()}
+
+        if self.sums is None:
+            self.sums = sums
+        elif self.per_image:
+            self.sums = {key: np.concatenate([self.sums[key], value])
+                for key, value in sums.items()}
+        else:
+            self.sums = {key: self.sums[key] + value for key, value in sums.items()}
+
+    def results(self) -> dict:
+        return results_from_sums(self.sums)
+
+
+def image_sums(y_true, y_pred) -> dict:
+    '''Sums used by the metrics, calculated for each image (first axis).'''
+
+    y_true = np.asarray(y_true, dtype='float64')
+    y_pred = np.asarray(y_pred, dtype='float64').reshape(y_true.shape)
+
+    axes = tuple(range(1, y_true.ndim))
+    product = y_true * y_pred
+
+    # jaccard_distance is calculated along the last axis (smooth=100)
+    intersection = np.abs(product).sum(axis=-1)
+    sum_ = (np.abs(y_true) + np.abs(y_pred)).sum(axis=-1)
+    jac = 1 - (1 - (intersection + 100) / (sum_ - intersection + 100)) * 100
+
+    y_clip = np.clip(y_pred, EPSILON, 1 - EPSILON)
+    crossentropy = -(y_true * np.log(y_clip) + (1 - y_true) * np.log(1 - y_clip))
+
+    return {
+        'count': np.full(len(y_true), y_true[0].size),
+        'true_pos': product.sum(axis=axes),
+        'sum_true': y_true.sum(axis=axes),
+        'sum_pred': y_pred.sum(axis=axes),
+        'jaccard_sum': jac.reshape(len(y_true), -1).sum(axis=1),
+        'jaccard_count': np.full(len(y_true), jac[0].size),
+        'correct': (y_true == np.round(y_pred)).sum(axis=axes),
+        'crossentropy': crossentropy.sum(axis=axes),
+    }
+
+
+def results_from_sums(sums: dict) -> dict:
+    '''Metrics calculated from the sums (scalars or arrays per image).'''
+
+    count = sums['count']
+    true_pos = sums['true_pos']
+    false_pos = sums['sum_pred'] - true_pos
+    false_neg = sums['sum_true'] - true_pos
+    true_neg = count - sums['sum_true'] - sums['sum_pred'] + true_pos
+
+    # empty masks (per image) result in nan for some metrics
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'accuracy': sums['correct'] / count,
+            'binary_crossentropy': sums['crossentropy'] / count,
+            'iou': true_pos / (sums['sum_true'] + sums['sum_pred'] - true_pos),
+            'jaccard': sums['jaccard_sum'] / sums['jaccard_count'],
+            'dice': (2 * true_pos + 1) / (sums['sum_true'] + sums['sum_pred'] + 1),
+            'specificity': true_neg / (true_neg + false_pos),
+            'sensitivity': true_pos / (true_pos + false_neg),
+        }
+
+
+def evaluate_predictions(y_true, y_pred,
+    thresholds: list=None,
+    per_image: bool=False,
+    chunk_size: int=64
+) -> dict:
+    '''Calculates all the metrics for a set of predictions, reading the
+    arrays (ex: memmaps) in chunks of images.
+
+    # Parameters
+    - y_true: labels (n, ...)
+    - y_pred: predictions with the same shape
+    - thresholds: list of thresholds used to binarize the predictions,
+    None in the list means soft predictions (default [None])
+    - per_image: also returns the metrics of each image
+    - chunk_size: number of images read at once
+
+    # Return
+    dict with one entry per threshold, each one with 'global' (metrics of
+    the whole dataset) and, if per_image, 'images' (arrays of metrics)'''
+
+    thresholds = [None] if thresholds is None else thresholds
+
+    accumulators = {t: MetricAccumulator(t, per_image=True) for t in thresholds}
+    for start in range(0, len(y_true), chunk_size):
+        # each chunk is read once for all the thresholds
+        true_chunk = np.asarray(y_true[start:start+chunk_size])
+        pred_chunk = np.asarray(y_pred[start:start+chunk_size])
+        for accumulator in accumulators.values():
+            accumulator.update(true_chunk, pred_chunk)
+
+    evaluation = {}
+    for threshold, accumulator in accumulators.items():
+        sums = accumulator.sums
+        evaluation[threshold] = {
+            'global': results_from_sums({k: v.sum() for k, v in sums.items()})}
+        if per_image:
+            evaluation[threshold]['images'] = results_from_sums(sums)
+
+    return evaluation
+
+
+def evaluate_file(pred_file: str, y_true, **kwargs) -> dict:
+    '''Same as evaluate_predictions, for predictions saved by
+    predict_model (predictions.npy). The file is memory-mapped.'''
+
+    return evaluate_predictions(y_true, np.load(pred_file, mmap_mode='r'), **kwargs)
+
+
+def weighted_results(results: dict, w1=.3, w2=.05, w3=.35, w4=.3) -> float:
+
+    return w1 * (1 - results['jaccard']) \
+         + w2 * results['specificity'] \
+         + w3 * results['sensitivity'] \
+         + w4 * results['dice']
+
+
+# same interface as image_metrics
+def iou_accuracy(y_true, y_pred):
+    return _results(y_true, y_pred)['iou']
+
+
+def jaccard_distance(y_true, y_pred):
+    return _results(y_true, y_pred)['jaccard']
+
+
+def specificity(y_true, y_pred):
+    return _results(y_true, y_pred)['specificity']
+
+
+def sensitivity(y_true, y_pred):
+    return _results(y_true, y_pred)['sensitivity']
+
+
+def dice_coef(y_true, y_pred):
+    return _results(y_true, y_pred)['dice']
+
+
+def iou_loss(y_true, y_pred):
+    return 1 - iou_accuracy(y_true, y_pred)
+
+
+def dice_coef_loss(y_true, y_pred):
+    return 1 - dice_coef(y_true, y_pred)
+
+
+def weighted_measures(y_true, y_pred, w1=.3, w2=.05, w3=.35, w4=.3):
+    return weighted_results(_results(y_true, y_pred), w1, w2, w3, w4)
+
+
+def weighted_measures_loss(y_true, y_pred, w1=.3, w2=.05, w3=.35, w4=.3):
+    return 1 - weighted_measures(y_true, y_pred, w1, w2, w3, w4)
+
+
+def supports(metric) -> bool:
+    '''Checks if a keras metric (or loss) can be calculated by score.'''
+
+    if _get_weighted(metric) is not None:
+        return True
+    return _get_name(metric) in METRIC_NAMES
+
+
+def score(metric, results: dict) -> float:
+    '''Returns the value of a keras metric (or loss) given by name or
+    function (including WeightedMetric.acc/loss) from the accumulated results.'''
+
+    weighted = _get_weighted(metric)
+    if weighted is not None:
+        value = weighted.combine(results)
+        return 1 - value if metric.__name__ == 'loss' else value
+
+    key = METRIC_NAMES.get(_get_name(metric))
+    if key is None:
+        raise ValueError(f'Metric not supported: {metric}')
+
+    return key(results) if callable(key) else results[key]
+
+
+def _results(y_true, y_pred) -> dict:
+    accumulator = MetricAccumulator()
+    accumulator.update(y_true, y_pred)
+    return accumulator.results()
+
+
+def _get_name(metric) -> str:
+    return metric if isinstance(metric, str) else getattr(metric, '__name__', None)
+
+
+def _get_weighted(metric):
+    # bound methods of WeightedMetric (checked by its weights)
+    owner = getattr(metric, '__self__', None)
+    if owner is not None and hasattr(owner, 'w_jac') and hasattr(owner, 'combine'):
+        return owner
+    return None
@@ -0,0 +1,122 @@
+'''Helpers to measure models before training (memory and speed).'''
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+
+def available_memory() -> int:
+    '''Physical memory available (in bytes), None if unknown.'''
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _output_size(shape) -> int:
+    # number of values of a layer output (per instance)
+    if isinstance(shape, list):
+        return sum(_output_size(s) for s in shape)
+    return int(np.prod([d for d in shape[1:] if d is not None]))
+
+
+def activation_memory(model, batch_size: int, dtype_size: int=4) -> int:
+    '''Estimates the memory (in bytes) used to train the model with the
+    given batch size: the outputs of all layers are kept for the backward
+    pass together with their gradients, and the weights are stored with
+    their gradients and the optimizer state (~4 copies).'''
+
+    activations = sum(_output_size(layer.output_shape) for layer in model.layers)
+    weights = model.count_params()
+    return (2 * activations * batch_size + 4 * weights) * dtype_size
+
+
+def count_macs(model) -> int:
+    '''Number of multiply-accumulate operations (per instance) of the
+    convolutional and dense layers of a model.'''
+
+    macs = 0
+    for layer in model.layers:
+        if hasattr(layer, 'filters') and hasattr(layer, 'kernel_size'):
+            kernel = int(np.prod(layer.kernel_size))
+            macs += _output_size(layer.output_shape) * kernel * layer.input_shape[-1]
+        elif hasattr(layer, 'units'):
+            macs += layer.input_shape[-1] * layer.units
+    return macs
+
+
+def tune_batch_size(model, x_data, y_data,
+    batch_sizes: List[int],
+    memory_limit: int=None,
+    steps: int=3
+) -> Tuple[int, float]:
+    '''Times a few training steps (train_on_batch) of a compiled model for
+    each batch size (in increasing order) and returns the one with the
+    highest throughput, and the throughput (samples per second).
+
+    Batch sizes larger than the data or whose estimated memory exceeds
+    memory_limit are not tried. The search stops at the first batch size
+    slower than the best one. The model is trained during the search:
+    weights (and optimizer state) must be restored by the caller.'''
+
+    best_size, best_speed = None, 0.0
+    for batch_size in sorted(batch_sizes):
+        if batch_size > len(x_data):
+            break
+        if memory_limit is not None \
+            and activation_memory(model, batch_size) > memory_limit:
+            break
+
+        x_batch, y_batch = x_data[:batch_size], y_data[:batch_size]
+
+        # first step builds the training function (not timed)
+        model.train_on_batch(x_batch, y_batch)
+        start = time.perf_counter()
+        for _ in range(steps):
+            model.train_on_batch(x_batch, y_batch)
+        speed = batch_size * steps / (time.perf_counter() - start)
+
+        if speed < best_speed:
+            break
+        best_size, best_speed = batch_size, speed
+
+    # at least the smallest size is used
+    if best_size is None:
+        best_size = min(batch_sizes)
+
+    return best_size, best_speed
+
+
+def measure_latency(model, input_shape: tuple,
+    batch_sizes: List[int],
+    warmup: int=2,
+    runs: int=20
+) -> dict:
+    '''Measures the inference time (predict_on_batch) of a model for each
+    batch size, after some warm-up runs (not timed). Inputs are zeros,
+    the time does not depend on the values.
+
+    Returns a dict (by batch size) with the median (p50) and 95th
+    percentile (p95) of the latency in seconds, and the throughput
+    (instances per second, from the median).'''
+
+    results = {}
+    for batch_size in batch_sizes:
+        x_batch = np.zeros((batch_size,) + tuple(input_shape), dtype='float32')
+        for _ in range(warmup):
+            model.predict_on_batch(x_batch)
+
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model.predict_on_batch(x_batch)
+            times.append(time.perf_counter() - start)
+
+        p50, p95 = np.percentile(times, [50, 95])
+        results[batch_size] = {
+            'p50': float(p50),
+            'p95': float(p95),
+            'throughput': batch_size / float(p50)}
+    return results
@@ -1,42 +1,23 @@
 import os
-import logging
 import datetime as dt
 from typing import Any, Union, List
-from abc import ABC, abstractmethod
 
 import numpy as np
 
 from keras import backend as K
 from keras.callbacks import History
 from keras.models import Model, model_from_json
+from keras.utils import Sequence
 
+from .base import BaseProblem
+from .dnns import np_metrics, profiling
+from .dnns.callbacks import LearningCurveStopping
+from .workers import configure_session
 from ..algorithms import Solution
 from ..datasets import Dataset
 from ..grammars import Grammar
 from ..utils import checkpoint as ckpt
-
-
-class BaseProblem(ABC):
-    '''BaseProblem class that works as a reference of what a problem class must
-    have to be used with the evolutionary algorithms.
-
-    Child classes must implement map_genotype_to_phenotype and evaluate.'''
-
-    def __init__(self, parser: Grammar, verbose: bool=False):
-        if parser is None:
-            raise AttributeError('Grammar parser cannot be None')
-
-        self.parser = parser
-        self.verbose = verbose
-        self.logger = logging.getLogger('cbioge')
-
-    @abstractmethod
-    def map_genotype_to_phenotype(self, solution: Solution) -> Any:
-        raise NotImplementedError('Not implemented yet.')
-
-    @abstractmethod
-    def evaluate(self, solution: Solution):
-        raise NotImplementedError('Not implemented yet.')
+from ..utils import timing
 
 
 class DNNProblem(BaseProblem):
@@ -54,29 +35,128 @@ class DNNProblem(BaseProblem):
         test_eval: bool=False,
         verbose: bool=False,
         train_args: dict={},
-        test_args: dict={}
+        test_args: dict={},
+        proxy_factor: int=None,
+        proxy_size: int=None,
+        streaming_eval: bool=False,
+        batch_sizes: List[int]=None,
+        memory_limit: int=None,
+        curve_stopping: dict=None,
+        max_params: int=None,
+        max_macs: int=None,
+        max_activation: int=None,
+        latency_batch_sizes: List[int]=None,
+        latency_threads: int=None,
+        latency_weight: float=0.0
     ):
 
         super().__init__(parser, verbose)
 
-        self.dataset = dataset
+        # solutions are trained on a reduced version of the dataset (lower
+        # resolution and/or fewer instances), the full dataset is used by
+        # evaluate_full (ex: for promoted solutions)
+        self.full_dataset = dataset
+        self.proxy_dataset = None
+        if proxy_factor is not None or proxy_size is not None:
+            self.proxy_dataset = dataset.proxy(proxy_factor or 1, proxy_size)
+
+        self.dataset = self.proxy_dataset or self.full_dataset
 
         self.batch_size = batch_size
         self.epochs = epochs
         self.test_eval = test_eval
 
-        self.loss = loss
         self.opt = self._parse_opt(opt)
-        self.metrics = metrics
+        self.loss, self.metrics = self._parse_loss(loss, metrics)
+
+        # custom losses cannot be switched, sparse labels are then
+        # converted to categorical per batch
+        self.categorical_batches = self.dataset.sparse_labels \
+            and not isinstance(self.loss, str)
 
         self.train_args = train_args
         self.test_args = test_args
 
+        # test metrics calculated from sums over all the batches (exact
+        # dataset-level values) instead of averages of per-batch values
+        self.streaming_eval = streaming_eval
+
+        # (intra_op, inter_op) threads of the keras sessions, kept after
+        # each evaluation (see workers.EvaluationWorker)
+        self.session_threads = None
+
+        # candidate batch sizes tried (for a few steps) before training each
+        # model, the fastest one is used instead of batch_size
+        # memory_limit (bytes) defaults to the available memory
+        self.batch_sizes = batch_sizes
+        self.memory_limit = memory_limit
+
+        # arguments of callbacks.LearningCurveStopping, training stops when
+        # the predicted fitness cannot reach the fitness_threshold
+        self.curve_stopping = curve_stopping
+
+        # hard limits of the models (None for no limit): number of weights,
+        # multiply-accumulate operations (per instance) and estimated
+        # training memory (bytes, for batch_size), violating solutions
+        # are not trained
+        self.max_params = max_params
+        self.max_macs = max_macs
+        self.max_activation = max_activation
+
+        # inference latency measured after training at each batch size
+        # (None to skip) using a fixed number of threads (None keeps the
+        # session), the fitness is reduced by latency_weight times the
+        # median latency (ms) of the first batch size
+        self.latency_batch_sizes = latency_batch_sizes
+        self.latency_threads = latency_threads
+        self.latency_weight = latency_weight
+
+    def set_fidelity(self, full: bool):
+        '''Switches between the full and the proxy dataset (if defined).
+        Phenotypes must be mapped again after switching, since the input
+        shape of the models may change.'''
+
+        if full or self.proxy_dataset is None:
+            self.dataset = self.full_dataset
+        else:
+            self.dataset = self.proxy_dataset
+
+    def evaluate_full(self, solution: Solution) -> bool:
+        '''Maps and evaluates a solution using the full dataset.
+        The result of the proxy evaluation (if any) is kept in solution.data.'''
+
+        if 'fidelity' in solution.data and solution.data['fidelity'] != 'full':
+            solution.data['proxy_fit'] = solution.fitness
+
+        self.set_fidelity(full=True)
+        try:
+            self.map_genotype_to_phenotype(solution)
+            return self.evaluate(solution)
+        finally:
+            self.set_fidelity(full=False)
+
     def _parse_opt(self, opt: Union[str, callable]) -> Union[str, dict]:
         if isinstance(opt, str):
             return opt
         return {'class': opt.__class__, 'config': opt.get_config()}
 
+    def _parse_loss(self, loss: Union[str, callable], metrics: list) -> tuple:
+        # switches to the sparse versions when the labels are not categorical
+        if not self.dataset.sparse_labels:
+            return loss, metrics
+
+        sparse_names = {
+            'categorical_crossentropy': 'sparse_categorical_crossentropy',
+            'categorical_accuracy': 'sparse_categorical_accuracy',
+            'top_k_categorical_accuracy': 'sparse_top_k_categorical_accuracy',
+        }
+
+        if isinstance(loss, str):
+            loss = sparse_names.get(loss, loss)
+        metrics = [sparse_names.get(m, m) if isinstance(m, str) else m for m in metrics]
+
+        return loss, metrics
+
     def _get_opt(self) -> Union[str, callable]:
         if isinstance(self.opt, str):
             return self.opt
@@ -110,14 +190,17 @@ class DNNProblem(BaseProblem):
 
         # creates mapping using the grammar
         else:
-            mapping = self.parser.recursive_parse(solution.genotype)
+            with timing.phase('parse'):
+                mapping = self.parser.recursive_parse(solution.genotype)
 
         # creates the model
-        model = self._build_model(mapping)
+        with timing.phase('build_model'):
+            model = self._build_model(mapping)
 
         if model is not None:
             solution.phenotype = model.to_json()
             solution.data['params'] = model.count_params()
+            solution.data['violations'] = self._check_constraints(model, solution)
         else:
             solution.phenotype = None
             solution.data['params'] = 0
@@ -125,6 +208,24 @@ class DNNProblem(BaseProblem):
 
         return model
 
+    def _check_constraints(self, model: Model, solution: Solution) -> List[str]:
+        # names of the limits exceeded by the model
+        violations = []
+        if self.max_params is not None and solution.data['params'] > self.max_params:
+            violations.append('params')
+
+        if self.max_macs is not None:
+            solution.data['macs'] = profiling.count_macs(model)
+            if solution.data['macs'] > self.max_macs:
+                violations.append('macs')
+
+        if self.max_activation is not None:
+            solution.data['activation'] = profiling.activation_memory(model, self.batch_size)
+            if solution.data['activation'] > self.max_activation:
+                violations.append('activation')
+
+        return violations
+
     def evaluate(self, solution: Solution) -> bool:
         '''Evaluates a solution by executing the training and calculating the
         fitness on the validation or test
@@ -136,43 +237,69 @@ class DNNProblem(BaseProblem):
         - accuracy (on validation or test)
         - loss
         - time spent
-        - history training'''
+        - history training
+        - inference latency (if latency_batch_sizes is defined)'''
+
+        # invalid mappings are not built and models that exceed the
+        # limits are not trained (the graph built by the mapping is released)
+        if solution.phenotype is None or solution.data.get('violations'):
+            solution.fitness = -1
+            self._reset_session()
+            return False
 
         try:
-            model = model_from_json(solution.phenotype)
+            with timing.phase('load_model'):
+                model = model_from_json(solution.phenotype)
 
-            model.compile(
-                loss=self.loss,
-                #TODO optimizer object must be instantiated every time
-                # to create a new tf graph and avoid bugs
-                optimizer=self._get_opt(),
-                metrics=self.metrics)
+            with timing.phase('compile'):
+                model.compile(
+                    loss=self.loss,
+                    #TODO optimizer object must be instantiated every time
+                    # to create a new tf graph and avoid bugs
+                    optimizer=self._get_opt(),
+                    metrics=self.metrics)
 
             # defines the portions of data used for training and eval
-            x_train, y_train = self.dataset.get_data('train')
+            x_train, y_train = self._get_data('train', shuffle=True)
+
+            batch_size = self.batch_size
+            if self.batch_sizes is not None and isinstance(x_train, np.ndarray):
+                with timing.phase('batch_tuning'):
+                    batch_size = self._tune_batch_size(model, x_train, y_train, solution)
+
+            train_args = dict(self.train_args or {})
 
             # there is validation data
             if self.dataset.x_valid is not None:
-                self.train_args['validation_data'] = self.dataset.get_data('valid')
+                x_valid, y_valid = self._get_data('valid')
+                train_args['validation_data'] = x_valid \
+                    if y_valid is None else (x_valid, y_valid)
+
+            stopping = None
+            if self.curve_stopping is not None and self.fitness_threshold is not None:
+                stopping = LearningCurveStopping(self.fitness_threshold, **self.curve_stopping)
+                train_args['callbacks'] = list(train_args.get('callbacks', [])) + [stopping]
 
             # defines the folder for saving the model if requested
             # solution_path = f'solution_{solution.id}_weights.h5'
 
             # runs training
             start_time = dt.datetime.today()
-            history = self.train_model(model, x_train, y_train,
-                batch_size=self.batch_size,
-                epochs=self.epochs,
-                verbose=self.verbose,
-                **self.train_args)
+            with timing.phase('fit'):
+                history = self.train_model(model, x_train, y_train,
+                    batch_size=batch_size,
+                    epochs=self.epochs,
+                    verbose=self.verbose,
+                    **train_args)
 
             if self.test_eval:
-                x_eval, y_eval = self.dataset.get_data('test')
+                x_eval, y_eval = self._get_data('test')
                 # runs evaluations (on validation or test)
-                loss, accuracy = self.test_model(model, x_eval, y_eval,
-                    batch_size=self.batch_size,
-                    verbose=self.verbose,
-                    **self.test_args)
+                with timing.phase('test'):
+                    loss, accuracy = self.test_model(model, x_eval, y_eval,
+                        batch_size=batch_size,
+                        verbose=self.verbose,
+                        **self.test_args)
             else:
                 # TODO custom metrics have to be named 'acc' and 'loss'
                 # in order for this to work
@@ -185,6 +312,15 @@ class DNNProblem(BaseProblem):
             solution.data['acc'] = accuracy
             solution.data['loss'] = loss
             solution.data['history'] = history.history
+            solution.data['fidelity'] = 'full' \
+                if self.dataset is self.full_dataset else 'proxy'
+            if stopping is not None:
+                solution.data['predicted_fit'] = stopping.prediction
+                solution.data['stopped_epoch'] = stopping.stopped_epoch
+
+            if self.latency_batch_sizes is not None:
+                with timing.phase('latency'):
+                    self._measure_latency(model, solution)
 
             return True
 
@@ -195,27 +331,87 @@ class DNNProblem(BaseProblem):
             return False
 
         finally:
+            with timing.phase('clear_session'):
+                self._reset_session()
+
+    def _tune_batch_size(self, model: Model, x_train, y_train, solution: Solution) -> int:
+        # trains a few steps with each batch size, the model is then
+        # restored (weights and a new optimizer)
+        weights = model.get_weights()
+
+        memory_limit = self.memory_limit or profiling.available_memory()
+        batch_size, speed = profiling.tune_batch_size(
+            model, x_train, y_train, self.batch_sizes, memory_limit)
+
+        model.set_weights(weights)
+        model.compile(loss=self.loss, optimizer=self._get_opt(), metrics=self.metrics)
+
+        solution.data['batch_size'] = batch_size
+        solution.data['samples_per_sec'] = speed
+
+        return batch_size
+
+    def _measure_latency(self, model: Model, solution: Solution):
+        if self.latency_threads is not None:
+            # the model is moved to a new session with the threads given
+            weights = model.get_weights()
             K.clear_session()
+            configure_session(self.latency_threads, 1)
+            model = model_from_json(solution.phenotype)
+            model.set_weights(weights)
+
+        latency = profiling.measure_latency(model, model.input_shape[1:],
+            self.latency_batch_sizes)
+        solution.data['latency'] = latency
+
+        if self.latency_weight:
+            p50 = latency[self.latency_batch_sizes[0]]['p50']
+            solution.fitness -= self.latency_weight * p50 * 1000
+
+    def _reset_session(self):
+        # releases the graph of the evaluated model, the new session
+        # keeps the thread configuration (if any)
+        K.clear_session()
+        if self.session_threads is not None:
+            configure_session(*self.session_threads)
+
+    def _get_data(self, attr_name: str, shuffle: bool=False) -> tuple:
+        # in-memory (or memory-mapped) arrays are passed directly to keras,
+        # other data (ex: folders) is streamed in batches
+        # (and sparse labels are converted per batch if needed)
+        x_data, y_data = self.dataset.get_data(attr_name)
+
+        if isinstance(x_data, np.ndarray) and not self.categorical_batches:
+            return x_data, y_data
+
+        return self.dataset.get_sequence(attr_name, self.batch_size,
+            shuffle=shuffle, categorical=self.categorical_batches), None
 
     def train_model(self, model: Model,
-        x_train: list,
-        y_train: list,
+        x_train: Union[list, Sequence],
+        y_train: list=None,
         save_path: str=None,
         **kwargs
     ) -> History:
         '''Executes the training of a model.
 
         # Parameters
-        x_train: training data
-        y_train: training labels
+        x_train: training data, or a keras Sequence that returns the batches
+        y_train: training labels (None if x_train is a Sequence)
         save_path: if value is different from None, the model weights will be saved
 
         # Optional parameters
-        kwargs: keras parameters, will be passed directly to model.fit'''
+        kwargs: keras parameters, will be passed directly to model.fit
+        (or model.fit_generator)'''
 
         #model.load_weights(os.path.join(ckpt.ckpt_folder, 'weights.h5'))
 
-        history = model.fit(x_train, y_train, **kwargs)
+        if isinstance(x_train, Sequence):
+            # the batch size is defined by the sequence
+            kwargs.pop('batch_size', None)
+            history = model.fit_generator(x_train, **kwargs)
+        else:
+            history = model.fit(x_train, y_train, **kwargs)
 
         if save_path is not None:
             model.save_weights(os.path.join(ckpt.CKPT_FOLDER, save_path))
@@ -223,8 +419,8 @@ class DNNProblem(BaseProblem):
         return history
 
     def test_model(self, model: Model,
-        x_test: list,
-        y_test: list,
+        x_test: Union[list, Sequence],
+        y_test: list=None,
         weights_path: str=None,
         **kwargs
     ) -> Any:
@@ -232,15 +428,50 @@ class DNNProblem(BaseProblem):
         if weights_path is not None:
             model.load_weights(weights_path)
 
+        if self.streaming_eval and np_metrics.supports(self.loss) \
+            and all(np_metrics.supports(m) for m in self.metrics):
+            return self._streaming_test(model, x_test, y_test,
+                kwargs.get('batch_size', self.batch_size))
+
+        if isinstance(x_test, Sequence):
+            kwargs.pop('batch_size', None)
+            return model.evaluate_generator(x_test, **kwargs)
+
         return model.evaluate(x_test, y_test, **kwargs)
 
+    def _streaming_test(self, model: Model,
+        x_test: Union[list, Sequence],
+        y_test: list,
+        batch_size: int
+    ) -> list:
+        # one forward pass over the test data, the loss and metrics are
+        # calculated from the sums accumulated in numpy
+        accumulator = np_metrics.MetricAccumulator()
+
+        if isinstance(x_test, Sequence):
+            batches = (x_test[i] for i in range(len(x_test)))
+        else:
+            batches = ((x_test[i:i+batch_size], y_test[i:i+batch_size])
+                for i in range(0, len(x_test), batch_size))
+
+        for x_batch, y_batch in batches:
+            accumulator.update(y_batch, model.predict_on_batch(x_batch))
+
+        results = accumulator.results()
+        return [np_metrics.score(self.loss, results)] \
+            + [np_metrics.score(m, results) for m in self.metrics]
+
     def predict_model(self, model: Model,
-        x_pred: list,
+        x_pred: Union[list, Sequence],
         save_path: str=None,
         **kwargs
     ) -> Any:
 
-        predictions = model.predict(x_pred, **kwargs)
+        if isinstance(x_pred, Sequence):
+            kwargs.pop('batch_size', None)
+            predictions = model.predict_generator(x_pred, **kwargs)
+        else:
+            predictions = model.predict(x_pred, **kwargs)
 
         if save_path is not None:
             if  not os.path.exists(save_path):
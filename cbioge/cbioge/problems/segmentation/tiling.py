@@ -0,0 +1,76 @@
+from typing import Callable
+
+import numpy as np
+
+from ...datasets.patches import grid_positions
+
+
+def blend_window(tile_size: tuple, overlap: tuple) -> np.ndarray:
+    '''Weights used to blend overlapping tiles. Weights decrease linearly
+    towards the borders (along the overlap) and are never zero, so the
+    stitched image has no seams.'''
+
+    axes = []
+    for size, over in zip(tile_size, overlap):
+        ramp = np.arange(1, size+1, dtype='float32') / (over + 1)
+        axes.append(np.minimum(1.0, np.minimum(ramp, ramp[::-1])))
+
+    return np.outer(axes[0], axes[1])[..., np.newaxis]
+
+
+def predict_tiled(predict_fn: Callable,
+    images,
+    tile_size: tuple,
+    overlap: tuple=(0, 0),
+    batch_size: int=16,
+    out: np.ndarray=None
+) -> np.ndarray:
+    '''Predicts images one tile at a time and stitches the results.
+
+    Tiles overlap by the given number of pixels and are blended with
+    blend_window. Memory usage is bounded by the tile batch and one image,
+    the stitched predictions are written to out (ex: a memmap).
+
+    # Parameters
+    - predict_fn: function that receives a batch of tiles and returns their
+    predictions with the same height and width (ex: model.predict_on_batch)
+    - images: array-like data (n, height, width, channels)
+    - tile_size: (height, width) of the tiles (input shape of the model)
+    - overlap: (height, width) overlap between neighbor tiles
+    - batch_size: number of tiles per prediction
+    - out: array that receives the predictions (default a new array)'''
+
+    tile_h, tile_w = tile_size
+    height, width = np.shape(images[0])[:2]
+    if any(t > s for t, s in zip(tile_size, (height, width))):
+        raise ValueError(f'Tile {tuple(tile_size)} larger than image {(height, width)}')
+    if any(o >= t for o, t in zip(overlap, tile_size)):
+        raise ValueError(f'Overlap {overlap} must be smaller than the tile {tile_size}')
+
+    rows = grid_positions(height, tile_h, tile_h - overlap[0])
+    cols = grid_positions(width, tile_w, tile_w - overlap[1])
+    positions = [(r, c) for r in rows for c in cols]
+    window = blend_window(tile_size, overlap)
+
+    for index in range(len(images)):
+        image = images[index]
+        stitched = None
+        weights = np.zeros((height, width, 1), dtype='float32')
+
+        for start in range(0, len(positions), batch_size):
+            batch = positions[start:start+batch_size]
+            tiles = np.stack([image[r:r+tile_h, c:c+tile_w] for r, c in batch])
+            preds = np.asarray(predict_fn(tiles))
+
+            if stitched is None:
+                stitched = np.zeros((height, width, preds.shape[-1]), dtype='float32')
+            if out is None:
+                out = np.empty((len(images),) + stitched.shape, dtype='float32')
+
+            for (r, c), pred in zip(batch, preds):
+                stitched[r:r+tile_h, c:c+tile_w] += pred * window
+                weights[r:r+tile_h, c:c+tile_w] += window
+
+        out[index] = stitched / weights
+
+    return out
@@ -1,16 +1,25 @@
+import os
 import json
 from typing import Any, Union, List
 
+import numpy as np
+
 from keras.models import Model, model_from_json
 
+from ...algorithms import Solution
 from ...datasets import Dataset
 from ...grammars import Grammar
-from ...problems import DNNProblem
+from ..problem import DNNProblem
+from .tiling import predict_tiled
 
 
 class UNetProblem(DNNProblem):
     ''' Problem class for problems related to classification tasks for DNNs.
-        This class includes methods focused on the design of U-Nets.'''
+        This class includes methods focused on the design of U-Nets.
+
+        When patch_size is defined, models are built for (and trained on)
+        patches of the images: random patches for training (n_patches per
+        epoch) and a grid of patches for validation and test.'''
 
     def __init__(self, parser: Grammar, dataset: Dataset,
         batch_size: int=10,
@@ -21,11 +30,66 @@ class UNetProblem(DNNProblem):
         test_eval: bool=False,
         verbose: bool=False,
         train_args: dict=None,
-        test_args: dict=None
+        test_args: dict=None,
+        patch_size: tuple=None,
+        n_patches: int=None,
+        **kwargs
     ):
 
         super().__init__(parser, dataset, batch_size, epochs, opt, loss,
-            metrics, test_eval, verbose, train_args, test_args)
+            metrics, test_eval, verbose, train_args, test_args, **kwargs)
+
+        self.patch_size = patch_size
+        self.n_patches = n_patches
+
+    def _get_input_shape(self) -> tuple:
+        if self.patch_size is None:
+            return self.dataset.input_shape
+        return tuple(self.patch_size) + tuple(self.dataset.input_shape[2:])
+
+    def _get_data(self, attr_name: str, shuffle: bool=False) -> tuple:
+        if self.patch_size is None:
+            return super()._get_data(attr_name, shuffle)
+
+        # random patches for training, all of them for evaluation
+        mode = 'random' if shuffle else 'grid'
+        return self.dataset.get_patches(attr_name, self.patch_size,
+            self.batch_size, mode, self.n_patches), None
+
+    def predict_model(self, model: Model,
+        x_pred: list,
+        save_path: str=None,
+        tile_size: tuple=None,
+        overlap: tuple=(0, 0),
+        **kwargs
+    ) -> Any:
+        '''Predicts the masks of the images.
+
+        When tile_size is defined (or the model was built for patches), the
+        images are predicted in overlapping tiles that are blended together,
+        and the predictions are streamed to save_path/predictions.npy
+        (a memmap is returned). Memory usage is bounded by the tile batch
+        size (batch_size in kwargs) instead of the number of images.'''
+
+        tile_size = tile_size or self.patch_size
+        if tile_size is None:
+            return super().predict_model(model, x_pred, save_path, **kwargs)
+
+        out = None
+        if save_path is not None:
+            if not os.path.exists(save_path):
+                os.makedirs(save_path)
+            shape = (len(x_pred),) + np.shape(x_pred[0])[:2] + model.output_shape[-1:]
+            out = np.lib.format.open_memmap(os.path.join(save_path, 'predictions.npy'),
+                mode='w+', dtype='float32', shape=shape)
+
+        predictions = predict_tiled(model.predict_on_batch, x_pred, tile_size,
+            overlap, kwargs.get('batch_size', self.batch_size), out)
+
+        if out is not None:
+            out.flush()
+
+        return predictions
 
     def _reshape_mapping(self, mapping: List[Any]) -> List[List[Any]]:
         
@@ -36,7 +100,7 @@ class UNetProblem(DNNProblem):
             block = mapping[index]
             end = index + len(self.parser.blocks[block])
             new_mapping.append(mapping[index:end])
-            mapping = mapping[end:]
+            index = end
 
         return new_mapping
 
@@ -81,10 +145,12 @@ class UNetProblem(DNNProblem):
     def _get_layer_outputs(self, mapping: list):
         outputs = []
         depth = 0
+        bridges = []
         for _, block in enumerate(mapping):
             name, params = block[0], block[1:]
             if name == 'input':
-                output_shape = self.dataset.input_shape
+                # shape used to build the model (full or proxy dataset)
+                output_shape = tuple(params[0][1:])
             elif name == 'conv':
                 output_shape = self._calculate_output_size(output_shape, *params[1:4])
                 output_shape += (params[0],)
@@ -96,14 +162,49 @@ class UNetProblem(DNNProblem):
                 depth -= 1
                 factor = params[0]
                 output_shape = (output_shape[0] * factor, output_shape[1] * factor, output_shape[2])
+            elif name == 'bridge':
+                bridges.append(output_shape)
             elif name == 'concat':
-                output_shape = (output_shape[0], output_shape[1], output_shape[2]*2)
+                # channels of the bridge connection (if any) are added
+                other = bridges.pop() if bridges else output_shape
+                output_shape = (output_shape[0], output_shape[1], output_shape[2]+other[2])
             outputs.append(output_shape)
         return outputs
 
+    def _validate(self, mapping: list) -> List[str]:
+        '''Checks if a (reshaped and repaired) mapping results in a valid
+        model, without building it:
+        - output sizes of all layers are at least 1x1 with 1 channel
+        - concat layers have a bridge with the same size
+        - the output has the same size of the input
+
+        Returns the list of problems found (empty if the mapping is valid).'''
+
+        errors = []
+        outputs = self._get_layer_outputs(mapping)
+        bridges = []
+        for i, layer in enumerate(mapping):
+            name = layer[0]
+            if min(outputs[i]) < 1:
+                errors.append(f'{name} ({i}) has an invalid output {outputs[i]}')
+            if name == 'bridge':
+                bridges.append(outputs[i])
+            elif name == 'concat':
+                if not bridges:
+                    errors.append(f'{name} ({i}) has no bridge')
+                elif bridges.pop()[:2] != outputs[i-1][:2]:
+                    errors.append(f'{name} ({i}) inputs have different sizes')
+
+        if outputs[-1][:2] != outputs[0][:2]:
+            errors.append(f'output {outputs[-1]} does not match input {outputs[0]}')
+
+        return errors
+
     def _repair(self, mapping: list):
         # changes the kernel size of pooling layers to keep image dimensions
         # as valid values (avoid reducing the size to less than 1x1)
+        # the sizes are calculated for the input shape of the mapping, so
+        # the repair is valid for the dataset in use (full or proxy)
         outputs = self._get_layer_outputs(mapping)
         stack = []
         for i, layer in enumerate(mapping):
@@ -123,58 +224,47 @@ class UNetProblem(DNNProblem):
 
         base_block = {'class_name': None, 'name': None, 'config': {}, 'inbound_nodes': []}
 
-        if block_name in naming:
-            naming[block_name] += 1
-        else:
-            naming[block_name] = 0
+        naming[block_name] = naming.get(block_name, -1) + 1
         name = f'{block_name}_{naming[block_name]}'
 
-        base_block['class_name'] = self.parser.blocks[block_name][0]
+        block = self.parser.blocks[block_name]
+        base_block['class_name'] = block[0]
         base_block['name'] = name
-        for name, value in zip(self.parser.blocks[block_name][1:], params):
-            base_block['config'][name] = value
+        base_block['config'] = dict(zip(block[1:], params))
         return base_block
 
     def _build_json_model(self, mapping: list) -> dict:
+        '''Builds the json structure of the model in a single pass.
 
-        names = {}
-
-        model = {'class_name': 'Model',
-            'config': {'layers': [], 'input_layers': [], 'output_layers': []}}
-
-        for i, layer in enumerate(mapping):
-            block_name, params = layer[0], layer[1:]
-            block = self._build_block(block_name, params, names)
-            model['config']['layers'].append(block)
+        Each layer receives the previous one as input; bridges are not
+        layers, they push the previous layer into a stack that is popped
+        by the next concat (so the deepest bridge connects first).'''
 
-        # creates a stack with the layers that will have a bridge (concat) connection
+        names = {}
+        layers = []
         stack = []
-        for i, layer in enumerate(model['config']['layers']):
-            if layer['class_name'] in ['bridge']: #CHECK
-                stack.append(model['config']['layers'][i-1]) #layer before (conv)
-                model['config']['layers'].remove(model['config']['layers'][i])
-
-        # iterates over layers and add previous layer as input of current one
-        for i, layer in enumerate(model['config']['layers'][1:]):
-            last = model['config']['layers'][i]
-            layer['inbound_nodes'].append([[last['name'], 0, 0]])
-
-        # creates and adds input and output layers to model
-        input_layer = model['config']['layers'][0]['name']
-        output_layer = model['config']['layers'][-1]['name']
-        model['config']['input_layers'].append([input_layer, 0, 0])
-        model['config']['output_layers'].append([output_layer, 0, 0])
-
-        # iterates over the layers looking for the concatenate ones to then
-        # adds the connection that comes from the bridge (stored in the stack)
-        for i, layer in enumerate(model['config']['layers'][1:]):
-            if layer['class_name'] == 'Concatenate':
-                other = stack.pop()
-                layer['inbound_nodes'][0].insert(0, [other['name'], 0, 0])
-
-        return model
+        last = None
+        for block_name, *params in mapping:
+            if block_name == 'bridge':
+                stack.append(last)
+                continue
 
-    def _build_model(self, mapping: list) -> Model:
+            block = self._build_block(block_name, params, names)
+            if last is not None:
+                block['inbound_nodes'].append([[last, 0, 0]])
+            if block['class_name'] == 'Concatenate':
+                block['inbound_nodes'][0].insert(0, [stack.pop(), 0, 0])
+            layers.append(block)
+            last = block['name']
+
+        return {'class_name': 'Model', 'config': {
+            'layers': layers,
+            'input_layers': [[layers[0]['name'], 0, 0]],
+            'output_layers': [[last, 0, 0]]}}
+
+    def _complete_mapping(self, mapping: list) -> list:
+        # reshaped mapping with the right side, input and output layers
+        # (and repaired for the input shape in use)
 
         reshaped_mapping = self._reshape_mapping(mapping)
 
@@ -182,13 +272,44 @@ class UNetProblem(DNNProblem):
         reshaped_mapping = self._build_right_side(reshaped_mapping)
 
         # insert base layers
-        reshaped_mapping.insert(0, ['input', (None,)+self.dataset.input_shape]) # input layer
+        reshaped_mapping.insert(0, ['input', (None,)+self._get_input_shape()]) # input layer
         reshaped_mapping.append(['conv', 2, 3, 1, 'same', 'relu']) # classification layer
         reshaped_mapping.append(['conv', 1, 1, 1, 'same', 'sigmoid']) # output layer
 
         # repair possible invalid connections
         self._repair(reshaped_mapping)
 
+        return reshaped_mapping
+
+    def _count_macs(self, mapping: list) -> int:
+        '''Number of multiply-accumulate operations of the convolutions
+        (per image) of a complete mapping.'''
+
+        outputs = self._get_layer_outputs(mapping)
+        macs = 0
+        for i, (name, *params) in enumerate(mapping):
+            if name == 'conv':
+                height, width, filters = outputs[i]
+                macs += height * width * filters * params[1]**2 * outputs[i-1][2]
+        return macs
+
+    def estimate_cost(self, solution: Solution) -> float:
+        # the cost is proportional to the operations of the convolutions
+        mapping = solution.data.get('mapping')
+        if mapping is None:
+            mapping = self.parser.recursive_parse(solution.genotype)
+        return float(max(self._count_macs(self._complete_mapping(mapping)), 1))
+
+    def _build_model(self, mapping: list) -> Model:
+
+        reshaped_mapping = self._complete_mapping(mapping)
+
+        # rejects mappings that cannot be repaired before building anything
+        errors = self._validate(reshaped_mapping)
+        if errors:
+            self.logger.debug('Invalid mapping: %s', '; '.join(errors))
+            return None
+
         # build the json structure of the model
         model = self._build_json_model(reshaped_mapping)
 
@@ -0,0 +1,134 @@
+'''Synthetic problems with cheap fitness functions (no training), used to
+measure the search engine itself: throughput of the algorithms,
+overhead of the workers, scaling, etc.'''
+import time
+import math
+import hashlib
+import functools
+import datetime as dt
+from typing import Callable, Union
+
+import numpy as np
+
+from .base import BaseProblem
+from ..algorithms import Solution
+from ..grammars import Grammar
+
+
+def landscape(depth: int, size: int, target_depth: int=10, target_size: int=1000) -> float:
+    '''Smooth fitness in (0, 1] that peaks at the target depth (number of
+    blocks) and size (sum of the numeric parameters, log scale).'''
+
+    depth_term = ((depth - target_depth) / target_depth) ** 2
+    size_term = (math.log1p(size) - math.log1p(target_size)) ** 2 / 2
+    return math.exp(-depth_term - size_term)
+
+
+def _lognormal(rng: np.random.RandomState, median: float, sigma: float) -> float:
+    return median * rng.lognormal(0.0, sigma)
+
+
+def lognormal_latency(median: float, sigma: float=0.5) -> Callable:
+    '''Latency distribution (seconds) for LookupProblem, it can be sent to
+    evaluation workers (lambdas cannot).'''
+
+    return functools.partial(_lognormal, median=median, sigma=sigma)
+
+
+class AnalyticProblem(BaseProblem):
+    '''Problem that scores the mapping of a solution with an analytic
+    function of its depth and size (see landscape), or with a custom
+    function that receives the mapping (list of blocks and values).'''
+
+    def __init__(self, parser: Grammar,
+        function: Callable=None,
+        verbose: bool=False
+    ):
+
+        super().__init__(parser, verbose)
+
+        self.function = function
+
+    def map_genotype_to_phenotype(self, solution: Solution) -> list:
+        if 'mapping' in solution.data:
+            mapping = solution.data['mapping']
+        else:
+            mapping = self.parser.recursive_parse(solution.genotype)
+
+        solution.phenotype = mapping
+        solution.data['mapping'] = mapping
+        return mapping
+
+    def evaluate(self, solution: Solution) -> bool:
+        mapping = solution.phenotype
+        if self.function is not None:
+            solution.fitness = self.function(mapping)
+        else:
+            depth = sum(1 for value in mapping if value in self.parser.blocks)
+            size = sum(value for value in mapping
+                if isinstance(value, (int, float)) and not isinstance(value, bool))
+            solution.fitness = landscape(depth, size)
+        return True
+
+
+class LookupProblem(BaseProblem):
+    '''Problem that reads the fitness of each solution from a table (by
+    the string of the genotype), ex: results of a previous run.
+
+    Solutions not in the table receive the default fitness or, if None, a
+    pseudo-random fitness in [0, 1) derived from the genotype (the same
+    for every run).
+
+    Each evaluation waits for the latency given: a constant (seconds) or a
+    function that receives a numpy RandomState and returns the seconds
+    (see lognormal_latency), which simulates the training time. With a
+    seed, the draws depend on the seed and the solution (id and genotype),
+    not on the process (ex: worker) that evaluates it.'''
+
+    def __init__(self, parser: Grammar,
+        table: dict=None,
+        default: float=None,
+        latency: Union[float, Callable]=None,
+        seed: int=None,
+        verbose: bool=False
+    ):
+
+        super().__init__(parser, verbose)
+
+        self.table = table or {}
+        self.default = default
+        self.latency = latency
+        self.seed = seed
+
+    def map_genotype_to_phenotype(self, solution: Solution) -> str:
+        solution.phenotype = str(solution.genotype)
+        return solution.phenotype
+
+    def evaluate(self, solution: Solution) -> bool:
+        start_time = dt.datetime.today()
+
+        key = solution.phenotype
+        digest = hashlib.sha1(key.encode()).hexdigest()
+
+        latency = self.latency
+        if callable(latency):
+            latency = latency(self._get_rng(solution, digest))
+        if latency:
+            time.sleep(latency)
+
+        if key in self.table:
+            solution.fitness = self.table[key]
+        elif self.default is not None:
+            solution.fitness = self.default
+        else:
+            solution.fitness = int(digest, 16) / 16 ** len(digest)
+
+        solution.data['time'] = dt.datetime.today() - start_time
+        return True
+
+    def _get_rng(self, solution: Solution, digest: str) -> np.random.RandomState:
+        # a state shared by all evaluations would be copied to each worker,
+        # which would then draw the same sequence
+        if self.seed is None:
+            return np.random.RandomState()
+        return np.random.RandomState([self.seed, solution.id or 0, int(digest[:8], 16)])
@@ -0,0 +1,490 @@
+import os
+import copy
+import mmap
+import logging
+import multiprocessing as mp
+import queue
+import threading
+from typing import List, Tuple, Sequence
+
+try:
+    import resource
+except ImportError: # pragma: no cover (not available on windows)
+    resource = None
+
+import numpy as np
+
+from ..algorithms import Solution
+from ..utils import timing, tracing
+
+
+def configure_session(intra_op: int=None, inter_op: int=None):
+    '''Replaces the current keras session by a new one using the number of
+    threads given (None keeps the tensorflow default).'''
+
+    import tensorflow as tf # pylint: disable=import-outside-toplevel
+    from keras import backend as K # pylint: disable=import-outside-toplevel
+
+    config = tf.ConfigProto(
+        intra_op_parallelism_threads=intra_op or 0,
+        inter_op_parallelism_threads=inter_op or 0)
+    K.set_session(tf.Session(config=config))
+
+
+def max_rss() -> int:
+    '''Peak resident memory of the current process (in bytes).'''
+
+    if resource is None:
+        return 0
+    # linux reports kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def available_cores() -> List[int]:
+    '''Cores the current process may run on.'''
+
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cores(cores: Sequence[int], weights: Sequence[float]) -> List[List[int]]:
+    '''Splits the cores into len(weights) slots of consecutive cores, with
+    sizes proportional to the weights (each slot has at least one core).'''
+
+    if len(weights) > len(cores):
+        raise ValueError(f'Cannot split {len(cores)} cores in {len(weights)} slots')
+
+    weights = [w if w and w > 0 else 1.0 for w in weights]
+    total = sum(weights)
+    extra = len(cores) - len(weights)
+    quotas = [w / total * extra for w in weights]
+    sizes = [1 + int(q) for q in quotas]
+
+    # the cores left go to the largest remainders
+    left = len(cores) - sum(sizes)
+    order = sorted(range(len(weights)), key=lambda i: int(quotas[i]) - quotas[i])
+    for i in order[:left]:
+        sizes[i] += 1
+
+    slots, start = [], 0
+    for size in sizes:
+        slots.append(list(cores[start:start+size]))
+        start += size
+    return slots
+
+
+def _set_threads(problem, threads: Tuple[int, int]):
+    # only keras problems (DNNProblem) have sessions to configure
+    if hasattr(problem, 'session_threads'):
+        problem.session_threads = threads
+        configure_session(*threads)
+
+
+def _set_cores(problem, cores: List[int]):
+    # pins the worker and uses one (intra-op) thread per core
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    _set_threads(problem, (len(cores), 1))
+
+
+def _memmap_handle(array) -> tuple:
+    # arrays memory-mapped from a file (not views of them) can be opened
+    # again by the workers instead of being pickled (which copies the data)
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.filename:
+        order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+        return (array.filename, array.dtype.str, array.offset, array.shape, order)
+    return None
+
+
+def _is_dataset(value) -> bool:
+    # imported here, problems without datasets do not need keras
+    from ..datasets import Dataset # pylint: disable=import-outside-toplevel
+    return isinstance(value, Dataset)
+
+
+class SharedProblem:
+    '''Picklable copy of a problem that is sent to the workers without the
+    data of its datasets.
+
+    Pickling a dataset copies all its arrays (memory-mapped ones included),
+    so each worker would hold a private copy of the data. Instead, arrays
+    memory-mapped from files (see Dataset.from_npy) are opened again by the
+    workers, and the other arrays are published once in shared memory
+    (see Dataset.share) and attached by the workers. load() rebuilds the
+    problem inside the worker.
+
+    The object owns the shared memory, close it when the workers are done.
+    Without shared memory (python < 3.8), those arrays are pickled.'''
+
+    def __init__(self, problem):
+
+        self.problem = copy.copy(problem)
+        self.mapped = {}
+        self.copied = {}
+        self.spec = None
+        self._shared = None
+
+        # datasets are only found in keras problems (ex: DNNProblem)
+        attrs = [attr for attr, value in vars(problem).items()
+            if hasattr(value, 'get_data') and _is_dataset(value)]
+
+        arrays = {}
+        stripped = {}
+        for attr in attrs:
+            dataset = getattr(problem, attr)
+            # aliases (ex: dataset and full_dataset) keep the same object
+            if id(dataset) not in stripped:
+                stripped[id(dataset)] = copy.copy(dataset)
+                for key, value in vars(dataset).items():
+                    if not isinstance(value, np.ndarray):
+                        continue
+                    handle = _memmap_handle(value)
+                    if handle is not None:
+                        self.mapped[f'{attr}.{key}'] = handle
+                    else:
+                        arrays[f'{attr}.{key}'] = value
+                    setattr(stripped[id(dataset)], key, None)
+            setattr(self.problem, attr, stripped[id(dataset)])
+
+        if arrays:
+            from ..datasets import SharedArrays # pylint: disable=import-outside-toplevel
+            try:
+                self._shared = SharedArrays(arrays)
+                self.spec = self._shared.spec
+            except RuntimeError:
+                self.copied = arrays
+
+    def __getstate__(self):
+        # the owner of the shared memory stays in this process
+        state = dict(self.__dict__)
+        state['_shared'] = None
+        return state
+
+    def load(self):
+        '''Returns the problem with the data of its datasets attached.'''
+
+        arrays = dict(self.copied)
+        if self.spec is not None:
+            from ..datasets import attach_arrays # pylint: disable=import-outside-toplevel
+            arrays.update(attach_arrays(self.spec))
+        for name, (file_name, dtype, offset, shape, order) in self.mapped.items():
+            arrays[name] = np.memmap(file_name, dtype, 'r', offset, shape, order)
+
+        for name, array in arrays.items():
+            attr, key = name.split('.', 1)
+            setattr(getattr(self.problem, attr), key, array)
+        return self.problem
+
+    def close(self):
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+
+def _worker_loop(conn, shared: SharedProblem, threads: Tuple[int, int]):
+    # runs inside the worker process: tensorflow (and the dataset) is loaded
+    # once and then solutions are mapped and evaluated as they arrive
+    problem = shared.load()
+    if threads is not None:
+        _set_threads(problem, threads)
+
+    logger = logging.getLogger('cbioge')
+    named = False
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+
+        solution, cores, state = message
+        problem.fitness_threshold = state['fitness_threshold']
+        timing.enable(state['timing'])
+        tracing.enable(state['tracing'])
+        if tracing.ENABLED and not named:
+            tracing.set_process_name(f'worker {os.getpid()}')
+            named = True
+        try:
+            if cores is not None:
+                _set_cores(problem, cores)
+            with timing.phase('mapping'):
+                problem.map_genotype_to_phenotype(solution)
+            with timing.phase('evaluate', solution=solution.id, worker=os.getpid()):
+                problem.evaluate(solution)
+        except Exception: # pylint: disable=broad-except
+            logger.exception('A problem was found in the evaluation worker.')
+            solution.fitness = -1
+
+        conn.send((solution.fitness, solution.phenotype, solution.data,
+            max_rss(), timing.collect(), tracing.collect()))
+    conn.close()
+
+
+class EvaluationWorker:
+    '''Long-lived process that evaluates solutions of a problem.
+
+    The problem is sent to the worker once (without the data of its
+    datasets, see SharedProblem), so tensorflow and the dataset are not
+    loaded again for each evaluation. Solutions are sent over a pipe and
+    the results (fitness, phenotype and data) are written back.
+
+    The worker is recycled (a new process is started) after max_evals
+    evaluations or when its memory (peak RSS, in bytes) reaches max_rss,
+    to contain memory leaks from tensorflow. A worker that does not answer
+    within timeout seconds is killed and started again.
+
+    threads is a tuple (intra_op, inter_op) used to configure the sessions
+    of the worker.'''
+
+    def __init__(self, problem,
+        max_evals: int=None,
+        max_rss: int=None, # pylint: disable=redefined-outer-name
+        threads: Tuple[int, int]=None,
+        start_method: str='spawn',
+        timeout: float=None,
+        shared: SharedProblem=None
+    ):
+
+        self.problem = problem
+        self.max_evals = max_evals
+        self.max_rss = max_rss
+        self.threads = threads
+        self.timeout = timeout
+        self.context = mp.get_context(start_method)
+
+        # a pool shares the same data with all its workers
+        self.shared = shared
+        self._owns_shared = shared is None
+
+        self.process = None
+        self.conn = None
+        self.evals = 0
+        self.rss = 0
+        self.restarts = 0
+        self.logger = logging.getLogger('cbioge')
+
+    def start(self):
+        if self.process is not None:
+            return
+
+        if self.shared is None:
+            self.shared = SharedProblem(self.problem)
+
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_loop,
+            args=(child_conn, self.shared, self.threads), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.evals = 0
+        self.rss = 0
+
+    def stop(self):
+        if self.process is None:
+            return
+
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def close(self):
+        '''Stops the worker and releases the shared data (if owned).'''
+
+        self.stop()
+        if self._owns_shared and self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def recycle(self):
+        self.stop()
+        self.start()
+        self.restarts += 1
+
+    def _restart(self):
+        # the process died or hung: it is killed and its pipe closed
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+        self.start()
+        self.restarts += 1
+
+    def evaluate(self, solution: Solution, cores: List[int]=None) -> bool:
+        '''Evaluates the solution in the worker process and updates it with
+        the results. A worker that dies (or times out) during the evaluation
+        is restarted and the solution receives fitness -1.
+
+        If cores are given, the worker is pinned to them (and the number of
+        threads is set accordingly) before the evaluation.'''
+
+        self.start()
+        try:
+            # state of the problem (and timing) changed after the start
+            state = {
+                'fitness_threshold': getattr(self.problem, 'fitness_threshold', None),
+                'timing': timing.ENABLED,
+                'tracing': tracing.ENABLED}
+            with timing.phase('worker', solution=solution.id, worker=self.process.pid):
+                self.conn.send((solution, cores, state))
+                if self.timeout is not None and not self.conn.poll(self.timeout):
+                    raise TimeoutError(f'No answer after {self.timeout}s')
+                fitness, phenotype, data, self.rss, times, events = self.conn.recv()
+        except TimeoutError:
+            self.logger.error(f'Evaluation worker timed out on solution {solution.id}, '
+                'restarting.')
+            solution.fitness = -1
+            self._restart()
+            return False
+        except (EOFError, BrokenPipeError, OSError):
+            self.logger.exception('Evaluation worker died, restarting.')
+            solution.fitness = -1
+            self._restart()
+            return False
+
+        solution.fitness = fitness
+        solution.phenotype = phenotype
+        solution.data = data
+        timing.merge(times)
+        tracing.merge(events)
+        self.evals += 1
+
+        if (self.max_evals is not None and self.evals >= self.max_evals) \
+            or (self.max_rss is not None and self.rss >= self.max_rss):
+            self.logger.debug('Recycling evaluation worker '
+                f'(evals: {self.evals} rss: {self.rss})')
+            self.recycle()
+
+        return solution.fitness != -1
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class WorkerPool:
+    '''Group of evaluation workers that evaluate a list of solutions
+    concurrently (each worker takes the next pending solution).
+
+    All workers share the same arguments (see EvaluationWorker), except
+    threads, which can also be given per worker. The data of the problem
+    is shared by all workers (see SharedProblem).'''
+
+    def __init__(self, problem, num_workers: int=1,
+        max_evals: int=None,
+        max_rss: int=None, # pylint: disable=redefined-outer-name
+        threads=None,
+        start_method: str='spawn',
+        timeout: float=None
+    ):
+
+        if not isinstance(threads, list):
+            threads = [threads] * num_workers
+
+        self.shared = SharedProblem(problem)
+        self.workers = [EvaluationWorker(problem, max_evals, max_rss,
+            threads[i], start_method, timeout, self.shared) for i in range(num_workers)]
+
+    def evaluate(self, solutions: List[Solution]):
+        pending = queue.Queue()
+        for solution in solutions:
+            pending.put(solution)
+
+        def run(worker):
+            while True:
+                try:
+                    solution = pending.get_nowait()
+                except queue.Empty:
+                    return
+                worker.evaluate(solution)
+
+        runners = [threading.Thread(target=run, args=(worker,))
+            for worker in self.workers]
+        for thread in runners:
+            thread.start()
+        for thread in runners:
+            thread.join()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+        self.shared.close()
+
+    def __enter__(self):
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CoreScheduler(WorkerPool):
+    '''Pool of workers that share the cores of the node.
+
+    Solutions are evaluated the most expensive first (see
+    BaseProblem.estimate_cost). Whenever workers are idle, the free cores
+    are split among the next solutions proportionally to their costs, and
+    each worker is pinned to its slot with the same number of threads, so
+    concurrent trainings do not oversubscribe the cores. The cores of a
+    finished solution are split again, not kept by its worker.'''
+
+    def __init__(self, problem, num_workers: int=1,
+        cores: List[int]=None,
+        max_evals: int=None,
+        max_rss: int=None, # pylint: disable=redefined-outer-name
+        start_method: str='spawn',
+        timeout: float=None
+    ):
+
+        self.problem = problem
+        self.cores = available_cores() if cores is None else list(cores)
+        num_workers = min(num_workers, len(self.cores))
+
+        super().__init__(problem, num_workers, max_evals, max_rss, None,
+            start_method, timeout)
+
+    def evaluate(self, solutions: List[Solution]):
+        costs = {id(s): self.problem.estimate_cost(s) for s in solutions}
+        pending = sorted(solutions, key=lambda s: -costs[id(s)])
+
+        idle = list(self.workers)
+        free = list(self.cores)
+        released = threading.Condition()
+
+        def run(worker, solution, slot):
+            try:
+                worker.evaluate(solution, slot)
+            finally:
+                with released:
+                    free.extend(slot)
+                    idle.append(worker)
+                    released.notify()
+
+        runners = []
+        with released:
+            while pending or len(idle) < len(self.workers):
+                # the slots are sized when the solutions are dispatched, the
+                # most expensive one gets the largest share of the free cores
+                jobs = pending[:len(idle)]
+                if jobs:
+                    del pending[:len(jobs)]
+                    free.sort()
+                    slots = split_cores(free, [costs[id(s)] for s in jobs])
+                    free.clear()
+                    for solution, slot in zip(jobs, slots):
+                        thread = threading.Thread(target=run,
+                            args=(idle.pop(), solution, slot))
+                        thread.start()
+                        runners.append(thread)
+                released.wait()
+
+        for thread in runners:
+            thread.join()
@@ -3,9 +3,12 @@ import os
 import re
 import pickle
 
+from . import timing
+
 CKPT_FOLDER = 'checkpoints'
 DATA_NAME = 'data_{0}.ckpt'
 SOLUTION_NAME = 'solution_{0}.ckpt'
+TRACE_NAME = 'trace.json'
 
 
 def get_new_unique_path(base_path, name=None):
@@ -47,6 +50,7 @@ def get_files_with_name(name_pattern, folder=None):
     return [os.path.basename(f) for f in files]
 
 
+@timing.timed('ckpt.save_data')
 def save_data(data, filename):
     # try saving the data in the checkpoint folder
     try:
@@ -58,12 +62,14 @@ def save_data(data, filename):
         return False
 
 
+@timing.timed('ckpt.load_data')
 def load_data(file_name, folder=None):
     # loads the file stored in the checkpoint folder
     with open(os.path.join(folder or CKPT_FOLDER, file_name), 'rb') as f:
         return pickle.load(f)
 
 
+@timing.timed('ckpt.delete_data')
 def delete_data(name_pattern):
     # deletes all files that matches the name pattern
     data_files = glob.glob(os.path.join(CKPT_FOLDER, name_pattern))
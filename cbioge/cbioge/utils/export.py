@@ -0,0 +1,266 @@
+'''Export of (evolved) solutions as trained artifacts for inference:
+keras weights and model, frozen graph and TFLite (float and int8).'''
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+import numpy as np
+import tensorflow as tf
+from keras import backend as K
+from keras.callbacks import ModelCheckpoint
+from keras.models import model_from_json
+
+from ..algorithms import Solution
+from ..problems.dnns import np_metrics, profiling
+from .post_run import get_best_from_checkpoint
+
+
+LOGGER = logging.getLogger('cbioge')
+
+REPORT_NAME = 'report.json'
+
+
+@contextmanager
+def full_fidelity(problem):
+    '''Uses the full dataset and disables the learning curve stopping of
+    the problem, the previous state is restored in the end.'''
+
+    full = problem.dataset is problem.full_dataset
+    threshold = problem.fitness_threshold
+    problem.set_fidelity(full=True)
+    problem.fitness_threshold = None
+    try:
+        yield problem
+    finally:
+        problem.set_fidelity(full=full)
+        problem.fitness_threshold = threshold
+
+
+def train_weights(problem, solution: Solution, weights_path: str) -> Solution:
+    '''Trains the solution (as in the evolution, but with the full dataset
+    and all the epochs) and saves the weights of the last epoch. Returns
+    the evaluated copy of the solution.'''
+
+    cpy = solution.copy(deep=True)
+    cpy.data['evo_fit'] = cpy.fitness
+
+    train_args = problem.train_args
+    problem.train_args = dict(train_args or {})
+    problem.train_args['callbacks'] = list(problem.train_args.get('callbacks', [])) \
+        + [ModelCheckpoint(weights_path, save_weights_only=True)]
+    try:
+        with full_fidelity(problem):
+            problem.map_genotype_to_phenotype(cpy)
+            problem.evaluate(cpy)
+    finally:
+        problem.train_args = train_args
+
+    if not os.path.exists(weights_path):
+        raise ValueError(f'Solution {solution.id} could not be trained.')
+
+    return cpy
+
+
+def freeze_graph(model, path: str):
+    '''Writes the graph of the model (in the current session) with the
+    variables converted to constants.'''
+
+    sess = K.get_session()
+    outputs = [out.op.name for out in model.outputs]
+    graph_def = tf.graph_util.convert_variables_to_constants(
+        sess, sess.graph.as_graph_def(), outputs)
+    folder, name = os.path.split(path)
+    tf.io.write_graph(graph_def, folder, name, as_text=False)
+
+
+def convert_tflite(model_path: str, path: str, samples: np.ndarray=None):
+    '''Converts a saved keras model to TFLite. If samples are given, the
+    model is quantized to int8 (weights and activations, calibrated with
+    the samples), inputs and outputs are kept as float.'''
+
+    converter = tf.lite.TFLiteConverter.from_keras_model_file(model_path)
+    if samples is not None:
+        def representative_dataset():
+            for sample in samples:
+                yield [sample[np.newaxis].astype('float32')]
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def tflite_predict(interpreter, x_data: np.ndarray) -> np.ndarray:
+    # runs the (single instance) interpreter over each instance
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    predictions = []
+    for instance in x_data:
+        interpreter.set_tensor(input_index, instance[np.newaxis].astype('float32'))
+        interpreter.invoke()
+        predictions.append(interpreter.get_tensor(output_index)[0])
+    return np.array(predictions)
+
+
+def _latency(predict, x_batch: np.ndarray, warmup: int, runs: int) -> dict:
+    # same format as profiling.measure_latency (batch of 1)
+    for _ in range(warmup):
+        predict(x_batch)
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict(x_batch)
+        times.append(time.perf_counter() - start)
+
+    p50, p95 = np.percentile(times, [50, 95])
+    return {1: {'p50': float(p50), 'p95': float(p95), 'throughput': 1 / float(p50)}}
+
+
+def benchmark_tflite(path: str, x_data: np.ndarray, warmup: int=2, runs: int=20) -> tuple:
+    '''Latency (batch of 1, see profiling.measure_latency) of a TFLite
+    model and its predictions for the data.'''
+
+    interpreter = tf.lite.Interpreter(model_path=path)
+    interpreter.allocate_tensors()
+
+    def predict(x_batch):
+        return tflite_predict(interpreter, x_batch)
+
+    latency = _latency(predict, x_data[:1], warmup, runs)
+    return latency, predict(x_data)
+
+
+def benchmark_graph(path: str, input_name: str, output_name: str,
+    x_data: np.ndarray,
+    warmup: int=2,
+    runs: int=20
+) -> tuple:
+    '''Latency (batch of 1) of a frozen graph (see freeze_graph), loaded in
+    a new session, and its predictions for the data. The names are the
+    ones of the input and output tensors of the model.'''
+
+    graph_def = tf.GraphDef()
+    with open(path, 'rb') as f:
+        graph_def.ParseFromString(f.read())
+
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+
+    with tf.Session(graph=graph) as sess:
+        inputs = graph.get_tensor_by_name(input_name)
+        outputs = graph.get_tensor_by_name(output_name)
+
+        def predict(x_batch):
+            return sess.run(outputs, {inputs: x_batch.astype('float32')})
+
+        latency = _latency(predict, x_data[:1], warmup, runs)
+        return latency, predict(x_data)
+
+
+def accuracy(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    '''Accuracy of the predictions: classes (argmax of the outputs) for
+    classification, pixels (threshold of 0.5) for segmentation.'''
+
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    if y_pred.ndim == 2 and y_pred.shape[-1] > 1:
+        labels = y_true.argmax(axis=-1) if y_true.shape[1:] == y_pred.shape[1:] \
+            else y_true.ravel()
+        return float(np.mean(y_pred.argmax(axis=-1) == labels))
+    return float(np_metrics.evaluate_predictions(y_true, y_pred)[None]['global']['accuracy'])
+
+
+def export_solution(problem, solution: Solution, folder: str,
+    weights_path: str=None,
+    batch_sizes: list=[1],
+    max_samples: int=100,
+    quantize: bool=True
+) -> dict:
+    '''Exports a solution for inference in the folder given:
+    - weights.h5 (trained unless weights_path is given) and model.h5
+    - model.pb (frozen graph)
+    - model_float.tflite and model_int8.tflite (if quantize)
+
+    Each variant is benchmarked (CPU latency and accuracy on the first
+    max_samples instances of the test set) and the results are written to
+    report.json, which is also returned.
+
+    The model is always built for the full dataset (the phenotype of the
+    evolution may have been built for a proxy, see DNNProblem proxy_factor).'''
+
+    os.makedirs(folder, exist_ok=True)
+
+    report = {'solution': solution.id, 'evo_fit': solution.fitness, 'variants': {}}
+    if weights_path is None:
+        weights_path = os.path.join(folder, 'weights.h5')
+        trained = train_weights(problem, solution, weights_path)
+        solution = trained
+        report['fitness'] = trained.fitness
+    else:
+        solution = solution.copy(deep=True)
+        with full_fidelity(problem):
+            problem.map_genotype_to_phenotype(solution)
+
+    # test data used in the benchmarks
+    x_test, y_test = problem.full_dataset.get_data('test')
+    samples = list(range(min(max_samples, len(x_test))))
+    x_test, y_test = np.asarray(x_test[samples]), np.asarray(y_test[samples])
+
+    K.clear_session()
+    model = model_from_json(solution.phenotype)
+    model.load_weights(weights_path)
+
+    model_path = os.path.join(folder, 'model.h5')
+    model.save(model_path, include_optimizer=False)
+
+    report['variants']['keras'] = {
+        'file': model_path,
+        'latency': profiling.measure_latency(model, model.input_shape[1:], batch_sizes),
+        'accuracy': accuracy(y_test, model.predict(x_test, batch_size=max(batch_sizes))),
+    }
+
+    graph_path = os.path.join(folder, 'model.pb')
+    freeze_graph(model, graph_path)
+    latency, predictions = benchmark_graph(graph_path,
+        model.inputs[0].name, model.outputs[0].name, x_test)
+    report['variants']['frozen_graph'] = {
+        'file': graph_path,
+        'latency': latency,
+        'accuracy': accuracy(y_test, predictions),
+    }
+
+    variants = {'tflite_float': ('model_float.tflite', None)}
+    if quantize:
+        variants['tflite_int8'] = ('model_int8.tflite', x_test)
+
+    for name, (file_name, calibration) in variants.items():
+        path = os.path.join(folder, file_name)
+        convert_tflite(model_path, path, calibration)
+        latency, predictions = benchmark_tflite(path, x_test)
+        report['variants'][name] = {
+            'file': path,
+            'latency': latency,
+            'accuracy': accuracy(y_test, predictions),
+        }
+
+    K.clear_session()
+
+    for variant in report['variants'].values():
+        variant['size'] = os.path.getsize(variant['file'])
+
+    with open(os.path.join(folder, REPORT_NAME), 'w') as f:
+        json.dump(report, f, indent=4, default=str)
+
+    LOGGER.info(f'Solution {solution.id} exported to {folder}')
+
+    return report
+
+
+def export_best(problem, folder: str, ckpt_folder: str=None, **kwargs) -> dict:
+    '''Exports the best solution of the latest checkpoint (see export_solution).'''
+
+    solution = get_best_from_checkpoint(ckpt_folder)
+    return export_solution(problem, solution, folder, **kwargs)
@@ -15,7 +15,12 @@ def run_solution(problem, solution):
 
     cpy = solution.copy(deep=True)
     cpy.data['evo_fit'] = cpy.fitness
-    problem.evaluate(cpy)
+
+    # solutions evolved with a proxy dataset run with the full one
+    if getattr(problem, 'proxy_dataset', None) is not None:
+        problem.evaluate_full(cpy)
+    else:
+        problem.evaluate(cpy)
 
     return cpy
 
@@ -0,0 +1,108 @@
+'''Wall clock time spent in each phase of the evolution (mapping, fit,
+checkpoints, ...), aggregated until collected.
+
+Timing is disabled by default, then phases cost a flag check:
+
+    timing.enable()
+    with timing.phase('fit'):
+        model.fit(...)
+    timing.collect() # {'fit': {'total': 12.3, 'count': 1}}
+
+Phases may be nested (the time of the inner phase is also counted in
+the outer one). Phases are also recorded as events of the timeline while
+tracing is enabled (see utils.tracing), with the tags given.'''
+import time
+import threading
+import functools
+from contextlib import nullcontext
+
+from . import tracing
+
+
+ENABLED = False
+
+_TOTALS = {}
+_LOCK = threading.Lock()
+_DISABLED = nullcontext()
+
+
+def enable(enabled: bool=True):
+    global ENABLED # pylint: disable=global-statement
+    ENABLED = enabled
+
+
+class _Phase:
+
+    __slots__ = ('name', 'tags', 'start', 'wall')
+
+    def __init__(self, name: str, tags: dict=None):
+        self.name = name
+        self.tags = tags
+        self.start = None
+        self.wall = None
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self.start
+        if ENABLED:
+            add(self.name, seconds)
+        if tracing.ENABLED:
+            tracing.add_span(self.name, self.wall, seconds, self.tags)
+
+
+def phase(name: str, **tags):
+    '''Context manager that measures the time of a phase (if timing or
+    tracing is enabled).'''
+
+    if not (ENABLED or tracing.ENABLED):
+        return _DISABLED
+    return _Phase(name, tags)
+
+
+def timed(name: str):
+    '''Decorator that measures each call of a function as a phase.'''
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not (ENABLED or tracing.ENABLED):
+                return function(*args, **kwargs)
+            with _Phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add(name: str, seconds: float, count: int=1):
+    with _LOCK:
+        total = _TOTALS.setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += count
+
+
+def merge(summary: dict):
+    '''Adds the times collected elsewhere (ex: in a worker process).'''
+
+    for name, values in summary.items():
+        add(name, values['total'], values['count'])
+
+
+def collect(reset: bool=True) -> dict:
+    '''Returns the total time (seconds) and number of calls of each phase
+    since the last reset.'''
+
+    with _LOCK:
+        summary = {name: {'total': total, 'count': count}
+            for name, (total, count) in _TOTALS.items()}
+        if reset:
+            _TOTALS.clear()
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    return ' '.join(f'{name}: {values["total"]:.2f}s ({values["count"]})'
+        for name, values in sorted(summary.items(), key=lambda x: -x[1]['total']))
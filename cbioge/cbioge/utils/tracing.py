@@ -0,0 +1,96 @@
+'''Timeline of a run in the Chrome Trace Event format (chrome://tracing,
+Perfetto), useful to inspect parallel evaluations.
+
+The phases measured with utils.timing are recorded as events (with their
+tags, ex: solution id) while tracing is enabled:
+
+    tracing.enable()
+    ... # run
+    tracing.save('checkpoints/trace.json')
+
+Each save appends the new events to the file (a JSON array of events), so
+it can be called periodically during a long run.'''
+import os
+import json
+import threading
+
+
+ENABLED = False
+
+_EVENTS = []
+_LOCK = threading.Lock()
+
+# files written by this process (replaced by the first save)
+_SAVED = set()
+
+# closing of the JSON array, replaced by the next events
+_END = b'\n]\n'
+
+
+def enable(enabled: bool=True):
+    global ENABLED # pylint: disable=global-statement
+    ENABLED = enabled
+
+
+def add_span(name: str, start: float, seconds: float, tags: dict=None):
+    '''Records a complete event (start is a time.time() value).'''
+
+    event = {
+        'name': name,
+        'cat': 'cbioge',
+        'ph': 'X',
+        'ts': start * 1e6,
+        'dur': seconds * 1e6,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': tags or {}}
+    with _LOCK:
+        _EVENTS.append(event)
+
+
+def set_process_name(name: str):
+    '''Names the current process in the timeline.'''
+
+    event = {'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+        'args': {'name': name}}
+    with _LOCK:
+        _EVENTS.append(event)
+
+
+def merge(events: list):
+    '''Adds the events recorded elsewhere (ex: in a worker process).'''
+
+    with _LOCK:
+        _EVENTS.extend(events)
+
+
+def collect(reset: bool=True) -> list:
+    with _LOCK:
+        events = list(_EVENTS)
+        if reset:
+            _EVENTS.clear()
+    return events
+
+
+def save(path: str):
+    '''Writes the events recorded since the last save. The first save of the
+    process replaces the file, the next ones append to it. The folder is
+    created if needed.'''
+
+    events = collect()
+    text = ',\n'.join(json.dumps(event) for event in events).encode()
+    try:
+        if path not in _SAVED:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'[\n' + text + _END)
+            _SAVED.add(path)
+        elif events:
+            with open(path, 'r+b') as f:
+                f.seek(-len(_END), os.SEEK_END)
+                empty = f.tell() <= 2
+                f.write((b'' if empty else b',\n') + text + _END)
+    except OSError:
+        # the events are kept for the next save
+        merge(events)
+        raise
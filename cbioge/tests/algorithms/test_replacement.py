@@ -37,4 +37,13 @@ def test_replace_with_elitism(rate, expected_fit):
     result.sort(key=lambda x: x.fitness)
 
     for i in range(len(result)):
-        assert result[i].fitness == expected[i].fitness
\ No newline at end of file
+        assert result[i].fitness == expected[i].fitness
+
+@pytest.mark.parametrize("maximize, expected", [(True, 0), (False, None)])
+def test_replace_worst_entry_threshold(maximize, expected):
+
+    replacement = ReplaceWorst(maximize=maximize)
+    population = [Solution(fitness=f) for f in range(0, 20, 2)]
+
+    assert replacement.entry_threshold(population) == expected
+    assert ElitistReplacement(maximize=maximize).entry_threshold(population) is None
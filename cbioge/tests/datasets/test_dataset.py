@@ -3,7 +3,7 @@ import numpy as np
 
 import pytest, pickle
 
-from cbioge.datasets import Dataset
+from cbioge.datasets import Dataset, pickle_to_npy, downsample
 
 def get_mockup_dataset(keys: list=None):
     data = {
@@ -43,6 +43,60 @@ def test_load_dataset_from_pickle():
     dataset = Dataset.from_pickle(pickle_file)
     assert dataset is not None
 
+def test_load_dataset_from_npy(tmp_path):
+    npy_folder = pickle_to_npy(get_mockup_pickle_file(), str(tmp_path))
+    dataset = Dataset.from_npy(npy_folder)
+
+    assert isinstance(dataset.x_train, np.memmap)
+    assert dataset.input_shape == (10, 10)
+    assert dataset.num_classes == 10
+
+def test_load_dataset_from_npz(tmp_path):
+    npz_file = os.path.join(str(tmp_path), 'dataset.npz')
+    np.savez(npz_file, **get_mockup_dataset(['x_train', 'y_train', 'x_test', 'y_test']))
+    dataset = Dataset.from_npy(npz_file, train_size=10)
+
+    assert dataset.train_size == 10
+    assert dataset.x_valid is None
+
+def test_npy_dataset_views(tmp_path):
+    npy_folder = pickle_to_npy(get_mockup_pickle_file(), str(tmp_path))
+    dataset = Dataset.from_npy(npy_folder)
+
+    x_data, _ = dataset.get_data('train', sample_size=10)
+    assert len(x_data) == 10
+    assert isinstance(x_data, np.memmap)
+    assert isinstance(dataset.x_valid, np.memmap)
+
+def get_mockup_folder(base_dir, size=10):
+    for attr_name in ['train', 'test']:
+        for sub_folder in ['image', 'label']:
+            folder = os.path.join(base_dir, attr_name, sub_folder)
+            os.makedirs(folder)
+            for i in range(size):
+                np.save(os.path.join(folder, f'{i}.npy'), np.full((8, 8), i))
+    return base_dir
+
+def test_load_dataset_from_folder(tmp_path):
+    folder = get_mockup_folder(str(tmp_path))
+    dataset = Dataset.from_folder(folder, valid_split=0.2)
+
+    assert dataset.input_shape == (8, 8, 1)
+    assert dataset.train_size == 8
+    assert dataset.valid_size == 2
+
+    x_data, y_data = dataset.get_data('train')
+    assert len(x_data) == len(y_data) == 8
+    assert (x_data[0] == 2).all()
+
+def test_sequence_from_folder(tmp_path):
+    folder = get_mockup_folder(str(tmp_path))
+    dataset = Dataset.from_folder(folder, cache=True)
+
+    x_batch, y_batch = dataset.get_sequence('test', batch_size=4)[0]
+    assert x_batch.shape == (4, 8, 8, 1)
+    assert (x_batch == y_batch).all()
+
 @pytest.mark.parametrize('field', ['train', 'test', 'valid'])
 @pytest.mark.parametrize('value', [None, 0, 10, 50, 100, -10, 200, -200])
 def test_attr_sizes(field, value):
@@ -91,6 +145,61 @@ def test_invalid_get_data(data_name):
     with pytest.raises(ValueError):
         Dataset(**get_mockup_dataset()).get_data(data_name)
 
+@pytest.mark.parametrize('sparse_labels', [True, False])
+def test_sparse_labels(sparse_labels):
+    dataset = Dataset(**get_mockup_dataset(), sparse_labels=sparse_labels)
+
+    expected = (100, 1) if sparse_labels else (100, 10)
+    assert dataset.y_train.shape == expected
+    assert dataset.num_classes == 10
+
+def test_sequence_with_sparse_labels():
+    dataset = Dataset(**get_mockup_dataset(), sparse_labels=True)
+
+    _, y_batch = dataset.get_sequence('train', 10, categorical=True)[0]
+    assert y_batch.shape == (10, 10)
+
+@pytest.mark.parametrize('factor', [1, 2, 4])
+def test_downsample(factor):
+    data = np.arange(2 * 8 * 8, dtype='float32').reshape((2, 8, 8, 1))
+    reduced = downsample(data, factor, chunk_size=1)
+
+    assert reduced.shape == (2, 8 // factor, 8 // factor, 1)
+    assert np.isclose(reduced.mean(), data.mean())
+
+def test_downsample_mask():
+    mask = np.zeros((1, 4, 4))
+    mask[0, :2, :2] = 1
+    mask[0, 2, 2] = 1
+
+    assert (downsample(mask, 2, mask=True)[0] == [[1, 0], [0, 0]]).all()
+
+def test_proxy_segmentation():
+    data_dict = get_mockup_dataset()
+    for attr_name in ['train', 'test', 'valid']:
+        data_dict[f'x_{attr_name}'] = np.zeros((20, 8, 8, 1))
+        data_dict[f'y_{attr_name}'] = np.ones((20, 8, 8, 1))
+    del data_dict['input_shape'], data_dict['num_classes']
+    dataset = Dataset(**data_dict)
+
+    proxy = dataset.proxy(factor=2, sample_size=5)
+
+    assert proxy.input_shape == (4, 4, 1)
+    assert dataset.input_shape == (8, 8, 1)
+    assert proxy.train_size == 5
+    assert proxy.y_valid.shape == (20, 4, 4, 1)
+
+def test_proxy_classification():
+    data_dict = get_mockup_dataset()
+    data_dict['y_train'] = np.arange(100) % 10
+    dataset = Dataset(**data_dict)
+
+    proxy = dataset.proxy(factor=2, sample_size=20)
+    _, y_data = proxy.get_data('train')
+
+    assert proxy.input_shape == (5, 5)
+    assert (y_data.sum(axis=0) == 2).all()
+
 def test_split():
 
     dataset = Dataset(**get_mockup_dataset())
@@ -104,4 +213,72 @@ def test_split():
     assert len(lB) == len(dataset.y_train) - split_size
 
 def test_shuffle():
-    pass
+    dataset = Dataset(**get_mockup_dataset())
+    data = np.arange(100)
+
+    x_data, y_data = dataset.shuffle(data, data)
+
+    assert (x_data == y_data).all()
+    assert sorted(x_data) == list(data)
+
+@pytest.mark.parametrize('sample_size', [10, 50, 100])
+def test_stratify(sample_size):
+    dataset = Dataset(**get_mockup_dataset())
+    labels = np.repeat(np.arange(4), [10, 20, 30, 40])
+
+    indexes = dataset.stratify(labels, sample_size)
+    counts = np.bincount(labels[indexes], minlength=4)
+
+    assert len(np.unique(indexes)) == sample_size
+    assert (np.abs(counts - np.array([10, 20, 30, 40]) * sample_size / 100) < 1).all()
+
+@pytest.mark.parametrize('shuffle, stratify', [(False, False), (True, False), (False, True)])
+def test_get_indexes(shuffle, stratify):
+    data_dict = get_mockup_dataset()
+    data_dict['y_train'] = np.arange(100) % 10
+    dataset = Dataset(**data_dict)
+
+    indexes = dataset.get_indexes('train', 20, shuffle, stratify)
+    x_data, y_data = dataset.get_data('train', 20, shuffle, stratify)
+
+    assert len(indexes) == len(np.unique(indexes)) == 20
+    assert len(x_data) == len(y_data) == 20
+
+def test_get_sequence_with_sample():
+    data_dict = get_mockup_dataset()
+    data_dict['x_train'] = np.arange(100).reshape((100, 1))
+    data_dict['y_train'] = np.arange(100)
+    del data_dict['num_classes']
+    dataset = Dataset(**data_dict)
+
+    indexes = dataset.get_indexes('train', sample_size=20, shuffle=True)
+    sequence = dataset.get_sequence('train', 8, indexes, shuffle=True, prefetch=0)
+    batches = [sequence[i] for i in range(len(sequence))]
+
+    assert len(sequence) == 3
+    assert sum(len(y) for _, y in batches) == 20
+    assert all((x[:, 0] == y).all() for x, y in batches)
+
+def test_subset():
+    data_dict = get_mockup_dataset()
+    data_dict['x_train'] = np.arange(100).reshape((100, 1))
+    dataset = Dataset(**data_dict)
+
+    subset = dataset.subset('train', np.array([5, 10, 15]))
+    x_data, _ = subset.get_data('train')
+
+    assert subset.train_size == 3
+    assert dataset.train_size == 100
+    assert list(x_data[[0, 1, 2]][:, 0]) == [5, 10, 15]
+    assert subset.x_train.data is dataset.x_train
+
+def test_proxy_keeps_memmaps(tmp_path):
+    dataset = Dataset.from_npy(Dataset(**get_mockup_dataset()).to_npy(str(tmp_path)))
+    proxy = dataset.proxy(factor=1, sample_size=10)
+
+    assert proxy.train_size == 10
+    assert proxy.input_shape == (10, 10)
+    # sets that are not sampled are not copied
+    assert proxy.x_test is dataset.x_test
+    assert proxy.y_valid is dataset.y_valid
+    assert isinstance(proxy.x_test, np.memmap)
@@ -0,0 +1,61 @@
+import numpy as np
+
+import pytest
+
+from cbioge.datasets import PatchSequence
+from cbioge.datasets.patches import grid_positions
+
+def get_mockup_images(size=4):
+    x_data = np.arange(size * 10 * 12).reshape((size, 10, 12, 1))
+    return x_data, x_data.copy()
+
+@pytest.mark.parametrize('size, patch, stride, expected', [
+    (10, 4, 4, [0, 4, 6]),
+    (10, 5, 5, [0, 5]),
+    (10, 10, 3, [0]),
+    (10, 4, 2, [0, 2, 4, 6]),])
+def test_grid_positions(size, patch, stride, expected):
+    assert grid_positions(size, patch, stride) == expected
+
+def test_random_patches():
+    x_data, y_data = get_mockup_images()
+    sequence = PatchSequence(x_data, y_data, (4, 4), batch_size=3, n_patches=10)
+
+    assert len(sequence) == 4
+    x_batch, y_batch = sequence[0]
+    assert x_batch.shape == (3, 4, 4, 1)
+    assert (x_batch == y_batch).all()
+
+    sequence.on_epoch_end()
+    assert len(sequence.patches) == 10
+
+def test_random_patches_order():
+    np.random.seed(0)
+    x_data, y_data = get_mockup_images(50)
+    sequence = PatchSequence(x_data, y_data, (10, 12), batch_size=50)
+
+    # patches are not grouped by image
+    images = sequence.patches[:, 0]
+    assert (np.diff(images) < 0).any()
+
+    # each patch (the whole image here) keeps its position in the batch
+    x_batch, y_batch = sequence[0]
+    assert (x_batch == x_data[images]).all()
+    assert (y_batch == y_data[images]).all()
+
+def test_grid_patches_cover_images():
+    x_data, y_data = get_mockup_images()
+    sequence = PatchSequence(x_data, y_data, (4, 5), batch_size=7, mode='grid')
+
+    covered = np.zeros(x_data.shape, dtype=bool)
+    for image, row, col in sequence.patches:
+        covered[image, row:row+4, col:col+5] = True
+
+    assert covered.all()
+    assert sum(len(sequence[i][0]) for i in range(len(sequence))) == len(sequence.patches)
+
+@pytest.mark.parametrize('mode, patch_size', [('other', (4, 4)), ('grid', (20, 4))])
+def test_invalid_patches(mode, patch_size):
+    x_data, y_data = get_mockup_images()
+    with pytest.raises(ValueError):
+        PatchSequence(x_data, y_data, patch_size, mode=mode)
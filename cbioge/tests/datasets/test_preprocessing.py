@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+import pytest
+
+from cbioge.datasets import preprocess
+from tests.datasets.test_dataset import get_mockup_pickle_file
+
+def test_preprocess_cache(tmp_path):
+    cache_folder = str(tmp_path)
+
+    dataset = preprocess(get_mockup_pickle_file(), cache_folder, train_size=50)
+    cached = preprocess(get_mockup_pickle_file(), cache_folder, train_size=50)
+
+    entries = [f for f in os.listdir(cache_folder) if os.path.isdir(os.path.join(cache_folder, f))]
+    assert len(entries) == 1
+    assert isinstance(cached.x_train, np.memmap)
+    assert cached.train_size == dataset.train_size == 50
+    assert cached.y_train.shape == (50, 10)
+    assert cached.num_classes == 10
+
+    files = [f for f in os.listdir(cache_folder) if os.path.isfile(os.path.join(cache_folder, f))]
+    assert files == ['hashes.json']
+
+def test_preprocess_params_key(tmp_path):
+    cache_folder = str(tmp_path)
+
+    preprocess(get_mockup_pickle_file(), cache_folder, train_size=50)
+    preprocess(get_mockup_pickle_file(), cache_folder, train_size=60)
+
+    entries = [f for f in os.listdir(cache_folder) if os.path.isdir(os.path.join(cache_folder, f))]
+    assert len(entries) == 2
+
+@pytest.mark.parametrize('mode', ['minmax', 'standard'])
+def test_preprocess_normalize(tmp_path, mode):
+    dataset = preprocess(get_mockup_pickle_file(), str(tmp_path), normalize=mode)
+    assert dataset.x_train.dtype == np.float32
+
+def test_preprocess_invalid_normalize(tmp_path):
+    with pytest.raises(ValueError):
+        preprocess(get_mockup_pickle_file(), str(tmp_path), normalize='other')
@@ -0,0 +1,52 @@
+import numpy as np
+
+import pytest
+
+from cbioge.datasets import BatchSequence
+
+def get_mockup_data(size=100):
+    x_data = np.arange(size).reshape((size, 1))
+    y_data = np.arange(size)
+    return x_data, y_data
+
+@pytest.mark.parametrize('batch_size', [1, 10, 32, 100, 200])
+def test_sequence_length(batch_size):
+    x_data, y_data = get_mockup_data()
+    sequence = BatchSequence(x_data, y_data, batch_size)
+    assert len(sequence) == int(np.ceil(len(x_data) / batch_size))
+
+@pytest.mark.parametrize('prefetch', [0, 1, 4])
+def test_sequence_covers_data(prefetch):
+    x_data, y_data = get_mockup_data()
+    sequence = BatchSequence(x_data, y_data, 32, shuffle=True, prefetch=prefetch)
+
+    for _ in range(2):
+        seen = []
+        for i in range(len(sequence)):
+            x_batch, y_batch = sequence[i]
+            assert (x_batch[:, 0] == y_batch).all()
+            seen.extend(y_batch)
+        sequence.on_epoch_end()
+        assert sorted(seen) == list(y_data)
+
+def test_sequence_without_labels():
+    x_data, _ = get_mockup_data()
+    sequence = BatchSequence(x_data, batch_size=10)
+    assert (sequence[1] == x_data[10:20]).all()
+
+def test_sequence_without_labels_keeps_order():
+    x_data, _ = get_mockup_data()
+    indexes = np.arange(len(x_data))[::-1]
+    sequence = BatchSequence(x_data, batch_size=10, indexes=indexes)
+    assert (sequence[0][:, 0] == indexes[:10]).all()
+
+def test_sequence_close():
+    x_data, y_data = get_mockup_data()
+    sequence = BatchSequence(x_data, y_data, 10, prefetch=2)
+    sequence[0]
+    sequence.close()
+    assert sequence._executor is None
+    # the threads are started again if needed
+    x_batch, _ = sequence[1]
+    assert (x_batch == x_data[10:20]).all()
+    sequence.close()
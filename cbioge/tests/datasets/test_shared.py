@@ -0,0 +1,48 @@
+import multiprocessing as mp
+
+import numpy as np
+
+import pytest
+
+from cbioge.datasets import Dataset, SharedArrays, attach_arrays, detach_arrays
+from tests.datasets.test_dataset import get_mockup_dataset
+
+def _sum_shared(spec, queue):
+    dataset = Dataset.from_shared(spec)
+    x_data, _ = dataset.get_data('train')
+    queue.put((float(x_data.sum()), dataset.train_size))
+
+def test_shared_arrays_attach():
+    array = np.arange(10)
+    with SharedArrays({'data': array}) as shared:
+        attached = attach_arrays(shared.spec)
+        assert (attached['data'] == array).all()
+        assert not attached['data'].flags.writeable
+        detach_arrays(shared.spec)
+
+def test_shared_arrays_close():
+    shared = SharedArrays({'data': np.arange(10)})
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        attach_arrays(shared.spec)
+
+def test_shared_dataset_in_process():
+    data_dict = get_mockup_dataset()
+    data_dict['x_train'] = np.ones((100, 10, 10))
+    dataset = Dataset(**data_dict, train_size=50)
+
+    with dataset.share() as shared:
+        queue = mp.Queue()
+        process = mp.Process(target=_sum_shared, args=(shared.spec, queue))
+        process.start()
+        total, train_size = queue.get(timeout=10)
+        process.join()
+
+    assert total == 50 * 10 * 10
+    assert train_size == 50
+
+def test_shared_arrays_unsupported(monkeypatch):
+    from cbioge.datasets import shared
+    monkeypatch.setattr(shared, 'shared_memory', None)
+    with pytest.raises(RuntimeError):
+        SharedArrays({'data': np.arange(10)})
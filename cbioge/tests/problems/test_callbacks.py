@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import pytest
+
+from cbioge.problems.dnns.callbacks import LearningCurveStopping, fit_learning_curve
+
+
+@pytest.mark.parametrize('curve, function', [
+    ('power', lambda t: 0.9 - 0.5 * t ** -0.8),
+    ('exp', lambda t: 0.8 - 0.6 * np.exp(-0.3 * t)),
+])
+def test_fit_learning_curve(curve, function):
+    values = [function(t) for t in range(1, 6)]
+    assert fit_learning_curve(values, 50, curve) == pytest.approx(function(50), abs=1e-3)
+
+def test_fit_learning_curve_unknown():
+    with pytest.raises(ValueError):
+        fit_learning_curve([0.1, 0.2], 10, 'linear')
+
+def run_epochs(callback, values, epochs=20):
+    callback.model = SimpleNamespace(stop_training=False)
+    callback.params = {'epochs': epochs}
+    callback.on_train_begin()
+    for epoch, value in enumerate(values):
+        callback.on_epoch_end(epoch, {'val_acc': value})
+        if callback.model.stop_training:
+            break
+    return callback
+
+def test_curve_stopping_stops_hopeless_training():
+    values = [0.5 - 0.3 * t ** -1.0 for t in range(1, 11)]
+    callback = run_epochs(LearningCurveStopping(0.9, min_epochs=3), values)
+    assert callback.model.stop_training
+    assert callback.stopped_epoch == 2
+    assert callback.prediction < 0.9
+
+def test_curve_stopping_keeps_promising_training():
+    # reaches 0.83 only at epoch 20
+    values = [0.95 - 0.5 * t ** -0.5 for t in range(1, 11)]
+    callback = run_epochs(LearningCurveStopping(0.8, min_epochs=3), values)
+    assert not callback.model.stop_training
+    assert callback.stopped_epoch is None
+    assert callback.prediction > 0.8 > values[-1]
+
+def test_curve_stopping_without_threshold():
+    callback = run_epochs(LearningCurveStopping(None), [0.1, 0.1, 0.1, 0.1])
+    assert not callback.model.stop_training
+    assert callback.prediction == pytest.approx(0.1)
@@ -0,0 +1,36 @@
+import numpy as np
+
+import pytest
+
+import keras.backend as K
+
+from cbioge.problems.dnns import image_metrics
+
+def get_mockup_masks():
+    np.random.seed(0)
+    y_true = (np.random.rand(4, 8, 8, 1) > 0.5).astype('float32')
+    y_pred = np.random.rand(4, 8, 8, 1).astype('float32')
+    return K.constant(y_true), K.constant(y_pred)
+
+def test_fused_measures():
+    y_true, y_pred = get_mockup_masks()
+
+    jac, dice, spe, sen = image_metrics.fused_measures(y_true, y_pred)
+
+    assert np.allclose(K.eval(jac), K.eval(image_metrics.jaccard_distance(y_true, y_pred)))
+    assert np.isclose(K.eval(dice), K.eval(image_metrics.dice_coef(y_true, y_pred)))
+    assert np.isclose(K.eval(spe), K.eval(image_metrics.specificity(y_true, y_pred)), atol=1e-5)
+    assert np.isclose(K.eval(sen), K.eval(image_metrics.sensitivity(y_true, y_pred)))
+
+@pytest.mark.parametrize('weights', [(.25, .25, .25, .25), (.1, .4, .1, .4)])
+def test_weighted_metric(weights):
+    y_true, y_pred = get_mockup_masks()
+    w_jac, w_dic, w_spe, w_sen = weights
+
+    metric = image_metrics.WeightedMetric(w_jac, w_dic, w_spe, w_sen)
+    expected = w_jac * (1 - image_metrics.jaccard_distance(y_true, y_pred)) \
+        + w_dic * image_metrics.dice_coef(y_true, y_pred) \
+        + w_spe * image_metrics.specificity(y_true, y_pred) \
+        + w_sen * image_metrics.sensitivity(y_true, y_pred)
+
+    assert np.allclose(K.eval(metric.acc(y_true, y_pred)), K.eval(expected), atol=1e-5)
@@ -0,0 +1,89 @@
+import numpy as np
+
+import pytest
+
+from cbioge.problems.dnns import np_metrics
+from cbioge.problems.dnns.image_metrics import WeightedMetric
+
+def get_mockup_masks(size=6):
+    np.random.seed(0)
+    y_true = (np.random.rand(size, 8, 8, 1) > 0.5).astype('float32')
+    y_pred = np.random.rand(size, 8, 8, 1).astype('float32')
+    return y_true, y_pred
+
+def get_results(y_true, y_pred, batch_size):
+    accumulator = np_metrics.MetricAccumulator()
+    for i in range(0, len(y_true), batch_size):
+        accumulator.update(y_true[i:i+batch_size], y_pred[i:i+batch_size])
+    return accumulator.results()
+
+def test_results_independent_of_batches():
+    y_true, y_pred = get_mockup_masks()
+
+    full = get_results(y_true, y_pred, len(y_true))
+    batched = get_results(y_true, y_pred, 4)
+
+    for key, value in full.items():
+        assert np.isclose(value, batched[key])
+
+def test_results_values():
+    y_true, y_pred = get_mockup_masks()
+    results = get_results(y_true, y_pred, 4)
+
+    t, p = y_true.ravel().astype('float64'), y_pred.ravel().astype('float64')
+    tp = (t * p).sum()
+    assert np.isclose(results['iou'], tp / (t + (1 - t) * p).sum())
+    assert np.isclose(results['dice'], (2 * tp + 1) / (t.sum() + p.sum() + 1))
+    assert np.isclose(results['sensitivity'], tp / (t * p + t * (1 - p)).sum())
+    assert np.isclose(results['specificity'],
+        ((1 - t) * (1 - p)).sum() / ((1 - t) * (1 - p) + (1 - t) * p).sum())
+    assert np.isclose(results['accuracy'], np.mean(t == np.round(p)))
+
+@pytest.mark.parametrize('metric', ['accuracy', 'acc', 'binary_crossentropy', 'dice_coef'])
+def test_score_by_name(metric):
+    results = get_results(*get_mockup_masks(), 4)
+    assert np_metrics.supports(metric)
+    assert np.isfinite(np_metrics.score(metric, results))
+
+def test_score_weighted_metric():
+    results = get_results(*get_mockup_masks(), 4)
+    metric = WeightedMetric(w_jac=0, w_dic=1, w_spe=0, w_sen=0)
+
+    assert np_metrics.supports(metric.get_metric())
+    assert np.isclose(np_metrics.score(metric.get_metric(), results), results['dice'])
+    assert np.isclose(np_metrics.score(metric.get_loss(), results), 1 - results['dice'])
+
+def test_score_unknown_metric():
+    assert not np_metrics.supports('mse')
+    with pytest.raises(ValueError):
+        np_metrics.score('mse', {})
+
+def test_metric_functions():
+    y_true, y_pred = get_mockup_masks()
+    results = get_results(y_true, y_pred, 4)
+
+    assert np.isclose(np_metrics.dice_coef(y_true, y_pred), results['dice'])
+    assert np.isclose(np_metrics.iou_loss(y_true, y_pred), 1 - results['iou'])
+    assert np.isclose(np_metrics.weighted_measures(y_true, y_pred),
+        np_metrics.weighted_results(results))
+
+def test_evaluate_predictions():
+    y_true, y_pred = get_mockup_masks()
+
+    evaluation = np_metrics.evaluate_predictions(y_true, y_pred,
+        thresholds=[None, 0.5], per_image=True, chunk_size=4)
+
+    assert set(evaluation.keys()) == {None, 0.5}
+    assert np.isclose(evaluation[None]['global']['dice'], get_results(y_true, y_pred, 6)['dice'])
+    assert evaluation[0.5]['images']['dice'].shape == (len(y_true),)
+    assert np.isclose(evaluation[0.5]['images']['dice'][0],
+        np_metrics.dice_coef(y_true[:1], y_pred[:1] >= 0.5))
+
+def test_evaluate_file(tmp_path):
+    y_true, y_pred = get_mockup_masks()
+    pred_file = str(tmp_path / 'predictions.npy')
+    np.save(pred_file, y_pred)
+
+    evaluation = np_metrics.evaluate_file(pred_file, y_true, chunk_size=5)
+
+    assert np.isclose(evaluation[None]['global']['iou'], np_metrics.iou_accuracy(y_true, y_pred))
@@ -1,3 +1,12 @@
+import os
+
+import numpy as np
+
+import pytest
+
+from cbioge.algorithms import Solution
+from cbioge.datasets import Dataset
+from cbioge.grammars import Grammar
 from cbioge.problems import BaseProblem, CNNProblem, DNNProblem
 
 
@@ -6,3 +15,73 @@ def test_is_cnnproblem_subclass_of_problem():
 
 def test_is_dnnproblem_subclass_of_problem():
     assert issubclass(DNNProblem, BaseProblem)
+
+def get_mockup_parser():
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    return Grammar(os.path.join(base_dir, 'assets', 'test_grammar.json'))
+
+def get_mockup_dataset(**kwargs):
+    return Dataset(
+        x_train=np.zeros((10, 8, 8, 1)), y_train=np.zeros((10, 1)),
+        x_test=np.zeros((10, 8, 8, 1)), y_test=np.zeros((10, 1)),
+        num_classes=2, **kwargs)
+
+@pytest.mark.parametrize('sparse_labels, expected', [
+    (True, 'sparse_categorical_crossentropy'),
+    (False, 'categorical_crossentropy')])
+def test_sparse_labels_loss(sparse_labels, expected):
+    problem = CNNProblem(get_mockup_parser(), get_mockup_dataset(sparse_labels=sparse_labels))
+    assert problem.loss == expected
+    assert not problem.categorical_batches
+
+class MockupModel:
+
+    def __init__(self, params):
+        self.params = params
+        self.layers = []
+
+    def count_params(self):
+        return self.params
+
+@pytest.mark.parametrize('params, expected', [(10, []), (100, ['params'])])
+def test_check_constraints(params, expected):
+    problem = CNNProblem(get_mockup_parser(), get_mockup_dataset(),
+        max_params=50, max_macs=10, max_activation=10**6)
+    solution = Solution(data={'params': params})
+    assert problem._check_constraints(MockupModel(params), solution) == expected
+    assert solution.data['macs'] == 0
+
+def test_violating_solution_is_not_trained():
+    problem = CNNProblem(get_mockup_parser(), get_mockup_dataset(), max_params=50)
+    resets = []
+    problem._reset_session = lambda: resets.append(True)
+    solution = Solution(phenotype='{}', data={'violations': ['params']})
+    assert not problem.evaluate(solution)
+    assert solution.fitness == -1
+    assert 'time' not in solution.data
+    assert resets == [True]
+
+def test_latency_weight():
+    problem = CNNProblem(get_mockup_parser(), get_mockup_dataset(),
+        latency_batch_sizes=[1], latency_weight=10)
+    model = MockupModel(10)
+    model.input_shape = (None, 8, 8, 1)
+    model.predict_on_batch = lambda x: x
+    solution = Solution(fitness=1.0, data={})
+    problem._measure_latency(model, solution)
+    p50 = solution.data['latency'][1]['p50']
+    assert solution.fitness == pytest.approx(1.0 - 10 * p50 * 1000)
+
+@pytest.mark.parametrize('mapping, expected', [
+    (['Conv2D', 'filters', 4, 'kernel_size', 3, 'padding', 'same', '#',
+      'MaxPooling2D', 'pool_size', 2, '#',
+      'Dense', 'units', 5, '#'], 8*8*4*9*1 + 4*4*4*5 + 4*4*5*2),
+    (['Conv2D', 'filters', 4, 'kernel_size', 3, 'strides', 2, '#',
+      'Flatten', '#'], 3*3*4*9*1 + 3*3*4*2),
+    (['Conv2D', 'filters', 4, 'kernel_size', 9, '#'], 1),])
+def test_estimate_cost(mapping, expected):
+    problem = CNNProblem(get_mockup_parser(), get_mockup_dataset())
+    # counted from the mapping, the model is not built
+    problem._build_model = None
+    solution = Solution(data={'mapping': mapping})
+    assert problem.estimate_cost(solution) == expected
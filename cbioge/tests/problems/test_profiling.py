@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+
+import pytest
+
+from cbioge.problems.dnns import profiling
+
+
+class MockupLayer:
+
+    def __init__(self, output_shape, input_shape=None, **kwargs):
+        self.output_shape = output_shape
+        self.input_shape = input_shape
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+
+class MockupModel:
+    '''Each training step takes the same time (any batch size)'''
+
+    def __init__(self):
+        self.layers = [MockupLayer((None, 8, 8, 1)), MockupLayer((None, 8, 8, 4))]
+        self.steps = []
+
+    def count_params(self):
+        return 100
+
+    def train_on_batch(self, x_batch, y_batch=None):
+        self.steps.append(len(x_batch))
+        time.sleep(0.002)
+
+
+def test_activation_memory():
+    model = MockupModel()
+    expected = (2 * (64 + 256) * 10 + 4 * 100) * 4
+    assert profiling.activation_memory(model, 10) == expected
+
+def test_tune_batch_size():
+    data = np.zeros((40, 8, 8, 1))
+    model = MockupModel()
+    batch_size, speed = profiling.tune_batch_size(model, data, data, [32, 8, 16, 64])
+    # the largest batch (that fits the data) is the fastest
+    assert batch_size == 32
+    assert speed > 0
+    assert 64 not in model.steps
+
+def test_tune_batch_size_memory_limit():
+    data = np.zeros((40, 8, 8, 1))
+    model = MockupModel()
+    limit = profiling.activation_memory(model, 16)
+    batch_size, _ = profiling.tune_batch_size(model, data, data, [8, 16, 32], limit)
+    assert batch_size == 16
+    assert 32 not in model.steps
+
+def test_tune_batch_size_nothing_fits():
+    data = np.zeros((4, 8, 8, 1))
+    model = MockupModel()
+    batch_size, speed = profiling.tune_batch_size(model, data, data, [8, 16])
+    assert batch_size == 8 and speed == 0.0
+
+def test_count_macs():
+    model = MockupModel()
+    model.layers = [
+        MockupLayer((None, 8, 8, 1)),
+        MockupLayer((None, 8, 8, 4), (None, 8, 8, 1), filters=4, kernel_size=(3, 3)),
+        MockupLayer((None, 4, 4, 4), (None, 8, 8, 4), pool_size=(2, 2)),
+        MockupLayer((None, 10), (None, 64), units=10)]
+    assert profiling.count_macs(model) == 8*8*4*9*1 + 64*10
+
+def test_measure_latency():
+    model = MockupModel()
+    model.predict_on_batch = model.train_on_batch
+    results = profiling.measure_latency(model, (8, 8, 1), [1, 4], warmup=1, runs=5)
+    assert list(results) == [1, 4]
+    assert model.steps == [1] * 6 + [4] * 6
+    for batch_size, result in results.items():
+        assert 0.002 <= result['p50'] <= result['p95']
+        assert result['throughput'] == pytest.approx(batch_size / result['p50'])
@@ -0,0 +1,116 @@
+import os
+import sys
+import copy
+import time
+import subprocess
+
+import pytest
+
+from cbioge.algorithms import (
+    Solution, GrammaticalEvolution, TournamentSelection, OnePointCrossover,
+    PointMutation, ReplaceWorst)
+from cbioge.grammars import Grammar
+from cbioge.problems import AnalyticProblem, LookupProblem
+from cbioge.problems.synthetic import landscape, lognormal_latency
+from cbioge.utils import checkpoint as ckpt
+
+
+def get_mockup_parser():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    return Grammar(os.path.join(base_dir, 'assets', 'grammars', 'cnn_example.json'))
+
+def test_landscape():
+    assert landscape(10, 1000) == pytest.approx(1.0)
+    assert 0 < landscape(2, 10) < landscape(8, 500) < 1
+
+def test_analytic_problem():
+    parser = get_mockup_parser()
+    problem = AnalyticProblem(parser)
+    solution = Solution(parser.create_solution(), data={})
+    problem.map_genotype_to_phenotype(solution)
+    assert problem.evaluate(solution)
+    assert 0 < solution.fitness <= 1
+    assert solution.data['mapping'] == solution.phenotype
+
+def test_analytic_problem_custom_function():
+    parser = get_mockup_parser()
+    problem = AnalyticProblem(parser, function=len)
+    solution = Solution(parser.create_solution(), data={})
+    problem.map_genotype_to_phenotype(solution)
+    problem.evaluate(solution)
+    assert solution.fitness == len(solution.phenotype)
+
+def test_lookup_problem():
+    table = {str([[0], [1]]): 0.9}
+    problem = LookupProblem(get_mockup_parser(), table)
+    solutions = [Solution([[0], [1]], data={}), Solution([[1], [1]], data={})]
+    for solution in solutions:
+        problem.map_genotype_to_phenotype(solution)
+        problem.evaluate(solution)
+    assert solutions[0].fitness == 0.9
+    assert 0 <= solutions[1].fitness < 1
+
+    # missing solutions always receive the same fitness
+    other = LookupProblem(get_mockup_parser())
+    other.map_genotype_to_phenotype(solutions[1])
+    fitness = solutions[1].fitness
+    other.evaluate(solutions[1])
+    assert solutions[1].fitness == fitness
+
+    problem = LookupProblem(get_mockup_parser(), default=0.1)
+    problem.map_genotype_to_phenotype(solutions[1])
+    problem.evaluate(solutions[1])
+    assert solutions[1].fitness == 0.1
+
+def test_lookup_problem_latency():
+    latency = lognormal_latency(0.01, sigma=0.1)
+    problem = LookupProblem(get_mockup_parser(), latency=latency, seed=0)
+    solution = Solution([[0]], data={})
+    problem.map_genotype_to_phenotype(solution)
+    start = time.perf_counter()
+    problem.evaluate(solution)
+    assert time.perf_counter() - start >= 0.005
+    assert solution.data['time'].total_seconds() >= 0.005
+
+def test_lookup_problem_latency_per_solution():
+    draws = []
+    def latency(rng):
+        draws.append(rng.rand())
+        return 0
+    problem = LookupProblem(get_mockup_parser(), latency=latency, seed=0)
+
+    # copies of the problem (ex: in two workers) draw by solution
+    workers = [copy.deepcopy(problem), copy.deepcopy(problem)]
+    for worker, index in [(workers[0], 1), (workers[1], 2), (workers[1], 1)]:
+        solution = Solution([[0]], id=index, data={})
+        worker.map_genotype_to_phenotype(solution)
+        worker.evaluate(solution)
+    assert draws[0] != draws[1]
+    assert draws[0] == draws[2]
+
+def test_synthetic_problems_without_keras():
+    # keras (and tensorflow) cannot be imported in the new process
+    code = '\n'.join([
+        'import sys',
+        'sys.modules["keras"] = sys.modules["tensorflow"] = None',
+        'from cbioge.problems import LookupProblem',
+        'from cbioge.algorithms import GrammaticalEvolution',
+        'print(LookupProblem.__name__)'])
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=base_dir,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'LookupProblem'
+
+def test_evolution_with_analytic_problem(tmp_path, monkeypatch):
+    monkeypatch.setattr(ckpt, 'CKPT_FOLDER', str(tmp_path))
+    parser = get_mockup_parser()
+    algorithm = GrammaticalEvolution(AnalyticProblem(parser),
+        pop_size=5, max_evals=20, seed=0,
+        selection=TournamentSelection(2, 2, maximize=True),
+        replacement=ReplaceWorst(maximize=True),
+        crossover=OnePointCrossover(0.8),
+        mutation=PointMutation(parser, 0.5))
+    best = algorithm.execute()
+    assert algorithm.evals == 20
+    assert best.fitness == max(s.fitness for s in algorithm.population) > 0
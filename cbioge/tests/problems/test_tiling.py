@@ -0,0 +1,47 @@
+import numpy as np
+
+import pytest
+
+from cbioge.problems.segmentation.tiling import blend_window, predict_tiled
+
+def get_mockup_images():
+    return np.random.rand(3, 20, 17, 1).astype('float32')
+
+@pytest.mark.parametrize('tile_size, overlap', [
+    ((4, 4), (0, 0)),
+    ((8, 8), (4, 2)),
+    ((20, 17), (0, 0)),
+    ((5, 7), (2, 3)),])
+def test_identity_stitching(tile_size, overlap):
+    images = get_mockup_images()
+
+    predictions = predict_tiled(lambda tiles: tiles, images, tile_size, overlap, batch_size=3)
+
+    assert predictions.shape == images.shape
+    assert np.allclose(predictions, images)
+
+def test_predictions_into_memmap(tmp_path):
+    images = get_mockup_images()
+    out = np.lib.format.open_memmap(str(tmp_path / 'pred.npy'),
+        mode='w+', dtype='float32', shape=images.shape[:3] + (2,))
+
+    predict_tiled(lambda tiles: np.concatenate([tiles, 1 - tiles], axis=-1),
+        images, (8, 8), (2, 2), batch_size=4, out=out)
+
+    assert np.allclose(np.load(str(tmp_path / 'pred.npy'))[..., 0], images[..., 0])
+
+def test_blend_window():
+    window = blend_window((6, 6), (2, 2))
+    assert window.shape == (6, 6, 1)
+    assert (window > 0).all()
+    assert window[3, 3, 0] == 1
+
+def test_invalid_overlap():
+    with pytest.raises(ValueError):
+        predict_tiled(lambda tiles: tiles, get_mockup_images(), (4, 4), (4, 0))
+
+def test_tile_larger_than_image():
+    images = get_mockup_images()
+    tile_size = (images.shape[1] + 1, 4)
+    with pytest.raises(ValueError):
+        predict_tiled(lambda tiles: tiles, images, tile_size)
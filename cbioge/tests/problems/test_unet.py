@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+
+import pytest
+
+from cbioge.datasets import Dataset
+from cbioge.grammars import Grammar
+from cbioge.problems import UNetProblem
+
+
+def get_mockup_problem():
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    parser = Grammar(os.path.join(base_dir, 'assets', 'grammars', 'unet_example.json'))
+    dataset = Dataset(
+        x_train=np.zeros((4, 8, 8, 1)), y_train=np.zeros((4, 8, 8, 1)),
+        x_test=np.zeros((4, 8, 8, 1)), y_test=np.zeros((4, 8, 8, 1)))
+    return UNetProblem(parser, dataset)
+
+def get_mapping(upsamp=2, filters=16):
+    return [
+        ['input', (None, 8, 8, 1)],
+        ['conv', filters, 3, 1, 'same', 'relu'],
+        ['bridge'],
+        ['maxpool', 2, 2, 'same'],
+        ['conv', 32, 3, 1, 'same', 'relu'],
+        ['upsamp', upsamp],
+        ['conv', 16, 2, 1, 'same', 'relu'],
+        ['concat', 3],
+        ['conv', 2, 3, 1, 'same', 'relu'],
+        ['conv', 1, 1, 1, 'same', 'sigmoid']]
+
+def test_validate_valid_mapping():
+    problem = get_mockup_problem()
+    assert problem._validate(get_mapping()) == []
+
+def test_concat_output_channels():
+    problem = get_mockup_problem()
+    outputs = problem._get_layer_outputs(get_mapping(filters=8))
+    assert outputs[7] == (8, 8, 24)
+
+@pytest.mark.parametrize('mapping', [
+    get_mapping(upsamp=1),
+    get_mapping(filters=0),
+    get_mapping()[:2] + get_mapping()[3:],
+])
+def test_validate_invalid_mapping(mapping):
+    problem = get_mockup_problem()
+    assert problem._validate(mapping) != []
+
+def test_reshape_mapping():
+    problem = get_mockup_problem()
+    mapping = ['conv', 16, 3, 1, 'same', 'relu', 'bridge', 'maxpool', 2, 2, 'same']
+    assert problem._reshape_mapping(mapping) == [
+        ['conv', 16, 3, 1, 'same', 'relu'], ['bridge'], ['maxpool', 2, 2, 'same']]
+
+def test_build_json_model_wiring():
+    problem = get_mockup_problem()
+    model = problem._build_json_model(get_mapping())
+    layers = model['config']['layers']
+    names = [layer['name'] for layer in layers]
+    assert 'bridge_0' not in names
+    assert len(layers) == len(get_mapping()) - 1
+    assert model['config']['input_layers'] == [['input_0', 0, 0]]
+    assert model['config']['output_layers'] == [[names[-1], 0, 0]]
+    concat = layers[names.index('concat_0')]
+    assert concat['inbound_nodes'] == [[['conv_0', 0, 0], ['conv_2', 0, 0]]]
+
+def test_build_json_model_nested_bridges():
+    problem = get_mockup_problem()
+    depth = 50
+    mapping = [['input', (None, 8, 8, 1)]] \
+        + [['conv', 8, 3, 1, 'same', 'relu'], ['bridge']] * depth \
+        + [['concat', 3]] * depth
+    layers = problem._build_json_model(mapping)['config']['layers']
+    concats = [layer for layer in layers if layer['class_name'] == 'Concatenate']
+    # the deepest bridge is the first to be connected
+    bridges = [concat['inbound_nodes'][0][0][0] for concat in concats]
+    assert bridges == [f'conv_{i}' for i in reversed(range(depth))]
+
+def test_count_macs():
+    problem = get_mockup_problem()
+    expected = 8*8*16*9*1 + 4*4*32*9*16 + 8*8*16*4*32 + 8*8*2*9*32 + 8*8*1*1*2
+    assert problem._count_macs(get_mapping()) == expected
@@ -0,0 +1,225 @@
+import os
+import time
+import pickle
+import threading
+
+import numpy as np
+
+import pytest
+
+from cbioge.algorithms import Solution
+from cbioge.datasets import Dataset
+from cbioge.problems import BaseProblem
+from cbioge.utils import timing, tracing
+from cbioge.problems.workers import (
+    EvaluationWorker, WorkerPool, CoreScheduler, SharedProblem,
+    available_cores, split_cores)
+from tests.datasets.test_dataset import get_mockup_dataset
+
+
+class MockupProblem(BaseProblem):
+
+    def __init__(self):
+        self.logger = None
+
+    def map_genotype_to_phenotype(self, solution):
+        solution.phenotype = sum(solution.genotype)
+
+    def evaluate(self, solution):
+        if solution.phenotype == -2:
+            os._exit(1)
+        if solution.phenotype == -3:
+            time.sleep(60)
+        if solution.phenotype >= 1000:
+            time.sleep(1)
+        if solution.phenotype < 0:
+            raise ValueError('invalid solution')
+        solution.fitness = solution.phenotype
+        solution.data['pid'] = os.getpid()
+        if hasattr(os, 'sched_getaffinity'):
+            solution.data['cores'] = sorted(os.sched_getaffinity(0))
+
+
+def test_worker_evaluates_solutions():
+    with EvaluationWorker(MockupProblem()) as worker:
+        solutions = [Solution([i, 1], data={}) for i in range(3)]
+        for solution in solutions:
+            assert worker.evaluate(solution)
+    assert [s.fitness for s in solutions] == [1, 2, 3]
+    assert [s.phenotype for s in solutions] == [1, 2, 3]
+    # the same process evaluates all solutions
+    assert len({s.data['pid'] for s in solutions}) == 1
+    assert solutions[0].data['pid'] != os.getpid()
+
+def test_worker_is_recycled():
+    with EvaluationWorker(MockupProblem(), max_evals=2) as worker:
+        solutions = [Solution([i], data={}) for i in range(4)]
+        for solution in solutions:
+            worker.evaluate(solution)
+        assert worker.restarts == 2
+    pids = [s.data['pid'] for s in solutions]
+    assert pids[0] == pids[1] and pids[2] == pids[3] and pids[0] != pids[2]
+
+def test_worker_failed_evaluation():
+    with EvaluationWorker(MockupProblem()) as worker:
+        solution = Solution([-1], data={})
+        assert not worker.evaluate(solution)
+        assert solution.fitness == -1
+
+def test_worker_died():
+    with EvaluationWorker(MockupProblem()) as worker:
+        process = worker.process
+        assert not worker.evaluate(Solution([-2], data={}))
+        assert worker.restarts == 1
+        assert process.exitcode == 1
+        assert worker.evaluate(Solution([1], data={}))
+
+def test_worker_timeout():
+    with EvaluationWorker(MockupProblem(), timeout=2) as worker:
+        process = worker.process
+        solution = Solution([-3], data={})
+        assert not worker.evaluate(solution)
+        assert solution.fitness == -1
+        assert worker.restarts == 1
+        assert not process.is_alive()
+        assert worker.evaluate(Solution([1], data={}))
+
+
+class DatasetProblem(BaseProblem):
+
+    def __init__(self, dataset):
+        self.logger = None
+        self.dataset = dataset
+        self.full_dataset = dataset
+
+    def map_genotype_to_phenotype(self, solution):
+        solution.phenotype = solution.genotype
+
+    def evaluate(self, solution):
+        solution.fitness = float(self.dataset.x_train.sum() + self.dataset.x_test.sum())
+        solution.data['memmap'] = isinstance(self.dataset.x_train, np.memmap)
+        solution.data['alias'] = self.dataset is self.full_dataset
+
+
+@pytest.mark.parametrize('from_npy', [False, True])
+def test_worker_dataset_is_not_pickled(tmp_path, from_npy):
+    data_dict = get_mockup_dataset()
+    data_dict['x_train'] = np.ones((100, 10, 10))
+    dataset = Dataset(**data_dict)
+    if from_npy:
+        dataset = Dataset.from_npy(dataset.to_npy(str(tmp_path)))
+    problem = DatasetProblem(dataset)
+
+    shared = SharedProblem(problem)
+    assert len(pickle.dumps(shared)) < data_dict['x_train'].nbytes / 10
+    # the problem itself is not changed
+    assert problem.dataset.x_train is not None
+
+    with WorkerPool(problem, num_workers=1) as pool:
+        solution = Solution([1], data={})
+        pool.evaluate([solution])
+    assert solution.fitness == 100 * 10 * 10
+    assert solution.data['memmap'] == from_npy
+    assert solution.data['alias']
+    shared.close()
+
+def test_pool_evaluates_all_solutions():
+    solutions = [Solution([i], data={}) for i in range(6)]
+    with WorkerPool(MockupProblem(), num_workers=2) as pool:
+        pool.evaluate(solutions)
+    assert [s.fitness for s in solutions] == list(range(6))
+
+@pytest.mark.parametrize('weights, expected', [
+    ([1, 1], [[0, 1, 2, 3], [4, 5, 6, 7]]),
+    ([3, 1], [[0, 1, 2, 3, 4, 5], [6, 7]]),
+    ([100, 1, 1], [[0, 1, 2, 3, 4, 5], [6], [7]]),
+    ([0, None], [[0, 1, 2, 3], [4, 5, 6, 7]]),
+])
+def test_split_cores(weights, expected):
+    assert split_cores(list(range(8)), weights) == expected
+
+def test_split_cores_too_many_slots():
+    with pytest.raises(ValueError):
+        split_cores([0, 1], [1, 1, 1])
+
+@pytest.mark.skipif(not hasattr(os, 'sched_getaffinity'), reason='linux only')
+def test_scheduler_pins_workers():
+    cores = available_cores()[:2]
+    solutions = [Solution([i], data={}) for i in range(4)]
+    with CoreScheduler(MockupProblem(), num_workers=2, cores=cores) as scheduler:
+        scheduler.evaluate(solutions)
+    assert [s.fitness for s in solutions] == list(range(4))
+    for solution in solutions:
+        assert len(solution.data['cores']) == 1
+        assert set(solution.data['cores']) <= set(cores)
+
+def test_scheduler_does_not_wait_for_stragglers():
+    # both workers share the same core, only the order matters
+    cores = available_cores()[:1] * 2
+    solutions = [Solution([1000], data={})] + [Solution([i], data={}) for i in range(4)]
+    with CoreScheduler(MockupProblem(), num_workers=2, cores=cores) as scheduler:
+        scheduler.evaluate(solutions)
+    assert [s.fitness for s in solutions] == [1000, 0, 1, 2, 3]
+    # the other worker evaluates all the other solutions meanwhile
+    pids = [s.data['pid'] for s in solutions]
+    assert len(set(pids[1:])) == 1 and pids[0] != pids[1]
+
+class MockupCostProblem(MockupProblem):
+
+    def estimate_cost(self, solution):
+        return sum(solution.genotype)
+
+class MockupSlotWorker:
+
+    def __init__(self, barrier):
+        self.barrier = barrier
+
+    def evaluate(self, solution, slot):
+        # solutions run in pairs
+        solution.data['slot'] = slot
+        self.barrier.wait()
+
+def test_scheduler_sizes_slots_at_dispatch():
+    scheduler = CoreScheduler(MockupCostProblem(), num_workers=2, cores=range(8))
+    barrier = threading.Barrier(2)
+    scheduler.workers = [MockupSlotWorker(barrier) for _ in range(2)]
+    solutions = [Solution([c], data={}) for c in [1, 3, 3, 2]]
+    scheduler.evaluate(solutions)
+    slots = [s.data['slot'] for s in solutions]
+    # each pair splits all the cores, the most expensive gets the largest slot
+    assert sorted(slots[1] + slots[2]) == list(range(8))
+    assert sorted(slots[3] + slots[0]) == list(range(8))
+    assert len(slots[3]) >= len(slots[0])
+
+def test_worker_timing_is_merged():
+    timing.enable()
+    try:
+        timing.collect()
+        with EvaluationWorker(MockupProblem()) as worker:
+            worker.evaluate(Solution([1], data={}))
+        summary = timing.collect()
+    finally:
+        timing.enable(False)
+    assert summary['mapping']['count'] == 1
+    assert summary['evaluate']['count'] == 1
+
+def test_worker_without_tracing():
+    tracing.collect()
+    with EvaluationWorker(MockupProblem()) as worker:
+        worker.evaluate(Solution([1], data={}))
+    assert tracing.collect() == []
+
+def test_worker_events_are_merged():
+    tracing.enable()
+    try:
+        tracing.collect()
+        with EvaluationWorker(MockupProblem()) as worker:
+            worker.evaluate(Solution([1], id=7, data={}))
+        events = tracing.collect()
+    finally:
+        tracing.enable(False)
+    names = {e['name']: e for e in events}
+    assert names['evaluate']['args'] == {'solution': 7, 'worker': names['evaluate']['pid']}
+    assert names['worker']['pid'] == os.getpid()
+    assert names['evaluate']['pid'] != os.getpid()
+    assert 'process_name' in names
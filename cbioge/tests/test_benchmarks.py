@@ -0,0 +1,29 @@
+from benchmarks import run
+from benchmarks.run import BENCHMARKS, compare, measure
+from cbioge.utils import checkpoint as ckpt
+
+
+def get_results(**times):
+    return {'results': {name: {'median': value} for name, value in times.items()}}
+
+def test_compare_flags_regressions():
+    baseline = get_results(fast=1.0, slow=1.0, removed=1.0)
+    results = get_results(fast=1.1, slow=1.5, added=1.0)
+    assert compare(results, baseline, tolerance=0.25) == ['slow']
+    assert compare(results, baseline, tolerance=0.6) == []
+
+def test_benchmarks_run():
+    name, function, param = next(b for b in BENCHMARKS if b[0] == 'grammar.create_solution[cnn]')
+    result = measure(function, param, repeat=1)
+    assert result['median'] > 0 and result['number'] >= 1
+
+def test_benchmarks_use_own_checkpoints(monkeypatch):
+    folders = {}
+    def measure_folder(function, param, repeat):
+        folders[function, param] = ckpt.CKPT_FOLDER
+        return {'median': 1.0}
+    monkeypatch.setattr(run, 'measure', measure_folder)
+    ckpt_folder = ckpt.CKPT_FOLDER
+    run.run_benchmarks(pattern='_state')
+    assert len(folders) > 1 and len(set(folders.values())) == len(folders)
+    assert ckpt.CKPT_FOLDER == ckpt_folder
@@ -0,0 +1,59 @@
+import numpy as np
+
+import pytest
+
+from cbioge.algorithms import Solution
+from cbioge.utils.export import accuracy, train_weights
+
+
+@pytest.mark.parametrize('y_true', [
+    np.array([[1, 0], [0, 1], [0, 1], [1, 0]]),
+    np.array([[0], [1], [1], [0]]),
+    np.array([0, 1, 1, 0]),
+])
+def test_classification_accuracy(y_true):
+    y_pred = np.array([[.9, .1], [.2, .8], [.6, .4], [.7, .3]])
+    assert accuracy(y_true, y_pred) == pytest.approx(0.75)
+
+def test_segmentation_accuracy():
+    y_true = np.zeros((2, 4, 4, 1))
+    y_true[0, :2] = 1
+    y_pred = np.full((2, 4, 4, 1), 0.2)
+    assert accuracy(y_true, y_pred) == pytest.approx(0.75)
+
+
+class MockupProblem:
+
+    def __init__(self):
+        self.full_dataset = 'full'
+        self.proxy_dataset = 'proxy'
+        self.dataset = self.proxy_dataset
+        self.fitness_threshold = 0.5
+        self.train_args = {}
+        self.evaluated = []
+
+    def set_fidelity(self, full):
+        self.dataset = self.full_dataset if full else self.proxy_dataset
+
+    def map_genotype_to_phenotype(self, solution):
+        solution.phenotype = self.dataset
+
+    def evaluate(self, solution):
+        self.evaluated.append((solution.phenotype, self.fitness_threshold))
+        open(self.weights_path, 'w').close()
+        solution.fitness = 0.9
+
+
+def test_train_weights_restores_problem(tmp_path):
+    problem = MockupProblem()
+    problem.weights_path = str(tmp_path / 'weights.h5')
+    trained = train_weights(problem, Solution([1], fitness=0.7, data={}), problem.weights_path)
+
+    # trained with the full dataset and without curve stopping
+    assert problem.evaluated == [('full', None)]
+    assert trained.fitness == 0.9
+    assert trained.data['evo_fit'] == 0.7
+
+    assert problem.dataset == 'proxy'
+    assert problem.fitness_threshold == 0.5
+    assert problem.train_args == {}
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from cbioge.utils import timing
+
+
+@pytest.fixture(autouse=True)
+def reset_timing():
+    timing.collect()
+    yield
+    timing.enable(False)
+    timing.collect()
+
+def test_disabled_phases_are_not_measured():
+    with timing.phase('fit'):
+        pass
+    assert timing.collect() == {}
+
+def test_phases_are_aggregated():
+    timing.enable()
+    for _ in range(3):
+        with timing.phase('fit'):
+            time.sleep(0.001)
+    with timing.phase('eval'):
+        pass
+    summary = timing.collect()
+    assert summary['fit']['count'] == 3
+    assert summary['fit']['total'] >= 0.003
+    assert summary['eval']['count'] == 1
+    # collected times are reset
+    assert timing.collect() == {}
+
+def test_timed_function():
+    @timing.timed('square')
+    def square(value):
+        return value * value
+
+    assert square(3) == 9
+    assert timing.collect() == {}
+    timing.enable()
+    assert square(4) == 16
+    assert timing.collect()['square']['count'] == 1
+
+def test_merge():
+    timing.enable()
+    timing.add('fit', 1.0)
+    timing.merge({'fit': {'total': 2.0, 'count': 2}, 'eval': {'total': 0.5, 'count': 1}})
+    assert timing.collect(reset=False) == {
+        'fit': {'total': 3.0, 'count': 3}, 'eval': {'total': 0.5, 'count': 1}}
+    assert timing.format_summary(timing.collect()) == 'fit: 3.00s (3) eval: 0.50s (1)'
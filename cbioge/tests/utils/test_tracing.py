@@ -0,0 +1,67 @@
+import os
+import json
+
+import pytest
+
+from cbioge.utils import timing, tracing
+
+
+@pytest.fixture(autouse=True)
+def reset_tracing():
+    tracing.collect()
+    yield
+    tracing.enable(False)
+    timing.enable(False)
+    tracing.collect()
+    timing.collect()
+
+def test_disabled_tracing():
+    with timing.phase('fit', solution=1):
+        pass
+    assert tracing.collect() == []
+
+def test_phases_are_traced(tmp_path):
+    tracing.enable()
+    tracing.set_process_name('evolution')
+    with timing.phase('evaluate', solution=3):
+        with timing.phase('fit'):
+            pass
+
+    # timing is not collected unless enabled
+    assert timing.collect() == {}
+
+    path = os.path.join(tmp_path, 'trace.json')
+    tracing.save(path)
+    with open(path) as f:
+        events = json.load(f)
+
+    assert [e['name'] for e in events] == ['process_name', 'fit', 'evaluate']
+    fit, evaluate = events[1:]
+    assert evaluate['ph'] == 'X' and evaluate['args'] == {'solution': 3}
+    assert evaluate['pid'] == os.getpid()
+    assert evaluate['ts'] <= fit['ts']
+    assert fit['ts'] + fit['dur'] <= evaluate['ts'] + evaluate['dur'] + 1
+
+def test_merge():
+    tracing.enable()
+    tracing.merge([{'name': 'fit', 'ph': 'X', 'ts': 0, 'dur': 1, 'pid': 1, 'tid': 1}])
+    assert len(tracing.collect()) == 1
+    assert tracing.collect() == []
+
+def test_save_appends_events(tmp_path):
+    tracing.enable()
+    # the folder is created by the first save
+    path = os.path.join(tmp_path, 'checkpoints', 'trace.json')
+    tracing.save(path)
+    with timing.phase('fit'):
+        pass
+    tracing.save(path)
+    tracing.save(path)
+    with timing.phase('evaluate'):
+        pass
+    tracing.save(path)
+
+    with open(path) as f:
+        events = json.load(f)
+    assert [e['name'] for e in events] == ['fit', 'evaluate']
+    assert tracing.collect() == []